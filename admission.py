@@ -0,0 +1,172 @@
+# admission.py
+"""Priority admission control and load shedding for expensive workflow calls."""
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of being admitted."""
+
+    def __init__(self, route: str, reason: str):
+        super().__init__(f"{route} request rejected: {reason}")
+        self.route = route
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    Bounded, priority-ordered admission for blocking model and tool calls.
+
+    Each route class ("refund", "conversation", ...) has its own priority,
+    queue depth and number of reserved slots. At most ``max_concurrent``
+    calls run at once: a route may always use its reserved slots, and the
+    slots nobody reserved are shared and handed to the highest-priority
+    waiter. Reservations keep one class of slow calls (e.g. 2 s vision
+    checks) from starving the others. Requests are shed when their route's
+    queue is full or they wait longer than ``queue_timeout``.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        priorities: Dict[str, int],
+        queue_limits: Dict[str, int],
+        reserved: Optional[Dict[str, int]] = None,
+        degrade_threshold: float = 0.75,
+        queue_timeout: float = 5.0,
+    ):
+        """
+        Initialize the controller.
+
+        Args:
+            max_concurrent: Number of calls allowed to run at the same time
+            priorities: Route name to priority (lower value is served first)
+            queue_limits: Route name to maximum number of waiting requests
+            reserved: Route name to slots only that route may use
+            degrade_threshold: Fraction of a route's capacity in use at which its callers should degrade
+            queue_timeout: Seconds a request may wait before being shed
+        """
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.priorities = dict(priorities)
+        self.queue_limits = dict(queue_limits)
+        self.reserved = {route: (reserved or {}).get(route, 0) for route in self.priorities}
+        self.shared = max_concurrent - sum(self.reserved.values())
+        if self.shared < 0:
+            raise ValueError("Reserved slots exceed max_concurrent")
+        self.degrade_threshold = degrade_threshold
+        self.queue_timeout = queue_timeout
+
+        self._cond = threading.Condition()
+        self._in_flight: Dict[str, int] = {route: 0 for route in self.priorities}
+        self._waiting: List[Tuple[int, int, str]] = []
+        self._queued: Dict[str, int] = {route: 0 for route in self.priorities}
+        self._granted = set()
+        self._seq = itertools.count()
+        self.stats: Dict[str, Dict[str, int]] = {
+            route: {"admitted": 0, "shed": 0, "timed_out": 0}
+            for route in self.priorities
+        }
+
+    def _check_route(self, route: str) -> None:
+        if route not in self.priorities:
+            raise ValueError(f"Unknown admission route: {route}")
+
+    def _shared_free(self) -> int:
+        # Slots of the shared pool not in use (caller holds the lock)
+        borrowed = sum(max(0, self._in_flight[r] - self.reserved[r]) for r in self._in_flight)
+        return self.shared - borrowed
+
+    def _free_for(self, route: str) -> int:
+        # Slots ``route`` could start a call in right now (caller holds the lock)
+        return max(0, self.reserved[route] - self._in_flight[route]) + self._shared_free()
+
+    def degraded(self, route: str) -> bool:
+        """Whether callers of ``route`` should switch to their cheap fallback paths."""
+        self._check_route(route)
+        with self._cond:
+            if self._queued[route]:
+                return True
+            capacity = self.reserved[route] + self.shared
+            if capacity == 0:
+                return True
+            return 1 - self._free_for(route) / capacity >= self.degrade_threshold
+
+    def _grant_next(self) -> None:
+        # Hand free slots to the highest-priority waiters that can use them (caller holds the lock)
+        skipped = []
+        while self._waiting:
+            entry = heapq.heappop(self._waiting)
+            _, seq, route = entry
+            if self._free_for(route):
+                self._queued[route] -= 1
+                self._in_flight[route] += 1
+                self._granted.add(seq)
+            else:
+                skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(self._waiting, entry)
+        self._cond.notify_all()
+
+    def acquire(self, route: str, timeout: Optional[float] = None) -> None:
+        """
+        Block until a slot is available for ``route``.
+
+        Args:
+            route: Route class of the request
+            timeout: Maximum wait in seconds, defaults to ``queue_timeout``
+
+        Raises:
+            AdmissionRejected: If the route queue is full or the wait times out
+        """
+        self._check_route(route)
+        timeout = self.queue_timeout if timeout is None else timeout
+        with self._cond:
+            # Any slot still free here is one no current waiter can use
+            if self._free_for(route) and not self._queued[route]:
+                self._in_flight[route] += 1
+                self.stats[route]["admitted"] += 1
+                return
+
+            if self._queued[route] >= self.queue_limits.get(route, 0):
+                self.stats[route]["shed"] += 1
+                raise AdmissionRejected(route, "queue full")
+
+            seq = next(self._seq)
+            heapq.heappush(self._waiting, (self.priorities[route], seq, route))
+            self._queued[route] += 1
+            self._grant_next()
+
+            deadline = time.monotonic() + timeout
+            while seq not in self._granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove((self.priorities[route], seq, route))
+                    heapq.heapify(self._waiting)
+                    self._queued[route] -= 1
+                    self.stats[route]["timed_out"] += 1
+                    raise AdmissionRejected(route, "timed out in queue")
+                self._cond.wait(remaining)
+
+            self._granted.discard(seq)
+            self.stats[route]["admitted"] += 1
+
+    def release(self, route: str) -> None:
+        """Return a slot obtained with ``acquire`` for ``route``."""
+        with self._cond:
+            self._in_flight[route] -= 1
+            self._grant_next()
+
+    @contextmanager
+    def admit(self, route: str, timeout: Optional[float] = None) -> Iterator[None]:
+        """Context manager wrapping ``acquire``/``release`` for one call."""
+        self.acquire(route, timeout)
+        try:
+            yield
+        finally:
+            self.release(route)
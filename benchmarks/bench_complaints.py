@@ -0,0 +1,87 @@
+# benchmarks/bench_complaints.py
+"""
+Throughput and flush-latency benchmark for the complaint sink.
+
+Several producer threads record complaints as fast as they can; the report
+shows producer-side record latency, committed throughput, group-commit batch
+sizes and the worst time a complaint spent buffered before commit, for each
+fsync mode.
+
+Run from the repository root:
+    python -m benchmarks.bench_complaints --complaints 100000 --producers 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from complaint_log import ComplaintSink, SYNC_MODES
+
+
+def run_mode(fsync: str, complaints: int, producers: int, batch_size: int, flush_interval: float) -> None:
+    """Benchmark a single fsync mode in a fresh database."""
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = ComplaintSink(
+            os.path.join(tmp, "complaints.db"),
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            fsync=fsync,
+        )
+        per_producer = complaints // producers
+        record_times = []
+        lock = threading.Lock()
+
+        def produce(seed: int) -> None:
+            rng = random.Random(seed)
+            worst = 0.0
+            for n in range(per_producer):
+                start = time.perf_counter()
+                sink.record(
+                    "The delivery person was rude",
+                    session_id=f"S{seed}-{n}",
+                    order_id=f"ORD-{rng.randrange(5000):04d}",
+                    rider_id=f"RIDER-{rng.randrange(500):04d}",
+                )
+                worst = max(worst, time.perf_counter() - start)
+            with lock:
+                record_times.append(worst)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=produce, args=(seed,)) for seed in range(producers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        produced = time.perf_counter() - start
+        sink.flush()
+        committed = time.perf_counter() - start
+
+        query_start = time.perf_counter()
+        rows = sink.complaints_per_rider_per_day()
+        query_time = time.perf_counter() - query_start
+        sink.close()
+
+        stats = sink.stats
+        print(
+            f"{fsync:<8}{stats['committed'] / committed:>12,.0f}/s"
+            f"{per_producer * producers / produced:>14,.0f}/s"
+            f"{max(record_times) * 1000:>12.2f}ms"
+            f"{stats['committed'] / max(stats['batches'], 1):>10.0f}"
+            f"{stats['max_flush_latency'] * 1000:>12.1f}ms"
+            f"{query_time * 1000:>10.1f}ms ({len(rows)} rider-days)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--complaints", type=int, default=100000, help="Total complaints to record")
+    parser.add_argument("--producers", type=int, default=8, help="Concurrent producer threads")
+    parser.add_argument("--batch-size", type=int, default=256, help="Group-commit size threshold")
+    parser.add_argument("--flush-interval", type=float, default=0.5, help="Group-commit time threshold (seconds)")
+    args = parser.parse_args()
+
+    print(f"{'fsync':<8}{'committed':>14}{'recorded':>14}{'max record':>14}{'batch':>10}{'max flush':>14}{'query':>10}")
+    for mode in SYNC_MODES:
+        run_mode(mode, args.complaints, args.producers, args.batch_size, args.flush_interval)
@@ -0,0 +1,80 @@
+# benchmarks/bench_eta.py
+"""
+Throughput benchmark for the in-memory ETA store.
+
+Measures batched rider location updates per second, ETA queries per second
+by order id, and nearby-rider queries per second on the spatial grid.
+
+Run from the repository root:
+    python -m benchmarks.bench_eta --riders 20000 --batch 1000
+"""
+import argparse
+import random
+import time
+
+from eta_store import OrderRiderStore, RiderSimulator
+
+
+def run(riders: int, batch: int, rounds: int, queries: int, seed: int) -> None:
+    """Run the benchmark and print throughput figures."""
+    store = OrderRiderStore()
+    simulator = RiderSimulator(store, num_riders=riders, seed=seed)
+    rng = random.Random(seed)
+    rider_ids = [f"RIDER-{n:04d}" for n in range(riders)]
+    order_ids = [f"ORD-{n:04d}" for n in range(riders)]
+
+    # Raw batched updates with random small moves
+    now = time.time()
+    batches = []
+    for r in range(rounds):
+        updates = []
+        for _ in range(batch):
+            rider_id = rider_ids[rng.randrange(riders)]
+            position = store.rider_position(rider_id)
+            updates.append((
+                rider_id,
+                position.lat + rng.uniform(-0.001, 0.001),
+                position.lon + rng.uniform(-0.001, 0.001),
+                now + r + 1,
+            ))
+        batches.append(updates)
+    start = time.perf_counter()
+    applied = sum(store.update_locations(updates) for updates in batches)
+    elapsed = time.perf_counter() - start
+    print(f"updates:      {applied / elapsed:>12,.0f} /s  ({applied} in batches of {batch})")
+
+    # Full simulator ticks (movement model + one batch per tick)
+    start = time.perf_counter()
+    for r in range(rounds):
+        simulator.step(1.0, now=now + rounds + r + 1)
+    elapsed = time.perf_counter() - start
+    print(f"sim ticks:    {rounds * riders / elapsed:>12,.0f} updates/s ({riders} riders per tick)")
+
+    # ETA queries by order id
+    sample = [order_ids[rng.randrange(riders)] for _ in range(queries)]
+    start = time.perf_counter()
+    for order_id in sample:
+        store.eta_minutes(order_id)
+    elapsed = time.perf_counter() - start
+    print(f"eta queries:  {queries / elapsed:>12,.0f} /s  ({elapsed / queries * 1e6:.2f} us each)")
+
+    # Nearby-rider queries on the grid
+    near_queries = max(1, queries // 100)
+    start = time.perf_counter()
+    found = 0
+    for _ in range(near_queries):
+        position = store.rider_position(rider_ids[rng.randrange(riders)])
+        found += len(store.riders_near(position.lat, position.lon, 1.0))
+    elapsed = time.perf_counter() - start
+    print(f"near queries: {near_queries / elapsed:>12,.0f} /s  ({found / near_queries:.1f} riders within 1 km)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--riders", type=int, default=20000, help="Number of riders and active orders")
+    parser.add_argument("--batch", type=int, default=1000, help="Location updates per batch")
+    parser.add_argument("--rounds", type=int, default=50, help="Number of update batches / simulator ticks")
+    parser.add_argument("--queries", type=int, default=200000, help="Number of ETA queries")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+    run(args.riders, args.batch, args.rounds, args.queries, args.seed)
@@ -0,0 +1,76 @@
+# benchmarks/bench_refunds.py
+"""
+Concurrency and recovery benchmark for the refund ledger.
+
+Fires thousands of concurrent refund requests (a share of them retries of
+earlier claims) from a thread pool, checks that no claim was paid twice,
+then measures how long it takes to rebuild the indexes from the log.
+
+Run from the repository root:
+    python -m benchmarks.bench_refunds --requests 20000 --workers 256
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from refund_ledger import RefundLedger
+
+
+def percentile(values, pct):
+    """Return the ``pct`` percentile of ``values`` (nearest-rank)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(requests: int, workers: int, duplicate_rate: float, fsync: bool, seed: int) -> None:
+    """Run the benchmark and print a summary."""
+    rng = random.Random(seed)
+    unique = max(1, int(requests * (1 - duplicate_rate)))
+    claims = [(f"S{n}", f"ORD-{n:06d}", "Namkeen", rng.randint(20, 500), f"{n:064x}") for n in range(unique)]
+    workload = claims + [rng.choice(claims) for _ in range(requests - unique)]
+    rng.shuffle(workload)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "refund_ledger.log")
+        ledger = RefundLedger(path, fsync=fsync)
+
+        def claim(args):
+            start = time.perf_counter()
+            result = ledger.refund(*args)
+            return result.refunded, time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(claim, workload))
+        elapsed = time.perf_counter() - start
+        ledger.close()
+
+        refunded = sum(1 for ok, _ in results if ok)
+        latencies = [latency for _, latency in results]
+        print(f"requests:   {requests} from {workers} workers (fsync={fsync})")
+        print(f"throughput: {requests / elapsed:,.0f} req/s")
+        print(f"latency:    p50 {percentile(latencies, 50) * 1000:.2f}ms  p99 {percentile(latencies, 99) * 1000:.2f}ms")
+        print(f"refunded:   {refunded} unique claims, {ledger.stats['duplicates']} duplicates rejected")
+        print(f"batches:    {ledger.stats['batches']} (avg {ledger.stats['entries'] / max(ledger.stats['batches'], 1):.1f} entries)")
+        assert refunded == unique, "a claim was refunded twice or lost"
+
+        start = time.perf_counter()
+        reopened = RefundLedger(path, fsync=fsync)
+        rebuild = time.perf_counter() - start
+        reopened.close()
+        print(f"rebuild:    {reopened.replayed} entries in {rebuild * 1000:.1f}ms ({reopened.replayed / rebuild:,.0f} entries/s)")
+        assert len(reopened) == unique and reopened.daily_totals() == ledger.daily_totals()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="Total refund requests")
+    parser.add_argument("--workers", type=int, default=256, help="Concurrent callers")
+    parser.add_argument("--duplicate-rate", type=float, default=0.2, help="Share of requests that retry an earlier claim")
+    parser.add_argument("--no-fsync", action="store_true", help="Skip fsync on group commit")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+    run(args.requests, args.workers, args.duplicate_rate, not args.no_fsync, args.seed)
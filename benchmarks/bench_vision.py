@@ -0,0 +1,213 @@
+# benchmarks/bench_vision.py
+"""
+Micro-benchmark of the vision model stages used by the refund nodes.
+
+Runs the exact prompts from ``problem_verify`` and
+``bill_amount_verification`` on the sample images in ``Images/`` at several
+resolutions and reports, per case, the median latency of image decode,
+``preprocess_inputs``, prefill, per-token decode and ``batch_decode``,
+decode tokens/sec, image token count and the change in resident memory over
+the case; peak RSS is reported once for the whole run. Results can be
+stored as a baseline and later runs compared against it.
+
+Run from the repository root:
+    python -m benchmarks.bench_vision --save-baseline
+    python -m benchmarks.bench_vision --tolerance 0.15
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+
+from PIL import Image
+
+from models import setup_vision_models
+from nodes import problem_verify_prompt, bill_amount_prompt
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Images")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "vision.json")
+
+# (case name, image file, prompt) mirroring what the nodes send
+CASES = [
+    ("problem_verify", "torn_packet.jpg", problem_verify_prompt("The packet of namkeen I received is torn")),
+    ("bill_amount", "bill_namkeen.jpg", bill_amount_prompt("namkeen")),
+]
+RESOLUTIONS = [336, 672, 1344, 0]  # Long side in pixels, 0 keeps the original
+
+# Stages compared against the baseline (lower is better)
+LATENCY_STAGES = ["decode_image", "preprocess", "prefill", "per_token_decode", "batch_decode"]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb() -> float:
+    """Current resident set size of this process in MiB (peak where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return peak_rss_mb()
+    return resident_pages * resource.getpagesize() / (1024 * 1024)
+
+
+def load_image(path: str, long_side: int) -> Image.Image:
+    """Decode an image and scale it so its longer side is ``long_side``."""
+    image = Image.open(path)
+    image.load()
+    if long_side:
+        scale = long_side / max(image.size)
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.BICUBIC)
+    return image
+
+
+def image_token_count(inputs) -> int:
+    """Number of image tokens the processor inserted into the prompt."""
+    if "num_img_tokens" in inputs:
+        return int(sum(int(n) for n in inputs["num_img_tokens"]))
+    # Phi-3.5-vision marks image positions with negative ids
+    return int((inputs["input_ids"] < 0).sum())
+
+
+def bench_case(ov_model, processor, image_path: str, prompt: str, long_side: int, new_tokens: int, repeat: int) -> dict:
+    """Time every stage of one prompt/image/resolution combination."""
+    eos = processor.tokenizer.eos_token_id
+    timings = {stage: [] for stage in LATENCY_STAGES}
+    width = height = image_tokens = prompt_tokens = 0
+    rss_before = current_rss_mb()
+
+    for run in range(repeat + 1):  # First pass warms up caches and is discarded
+        start = time.perf_counter()
+        image = load_image(image_path, long_side)
+        decode_image = time.perf_counter() - start
+
+        start = time.perf_counter()
+        inputs = ov_model.preprocess_inputs(text=prompt, image=image, processor=processor)
+        preprocess = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ov_model.generate(**inputs, eos_token_id=eos, max_new_tokens=1, do_sample=False)
+        prefill = time.perf_counter() - start
+
+        start = time.perf_counter()
+        generate_ids = ov_model.generate(
+            **inputs,
+            eos_token_id=eos,
+            max_new_tokens=new_tokens,
+            min_new_tokens=new_tokens,
+            do_sample=False,
+        )
+        full = time.perf_counter() - start
+        generate_ids = generate_ids[:, inputs["input_ids"].shape[1]:]
+        generated = generate_ids.shape[1]
+
+        start = time.perf_counter()
+        processor.batch_decode(generate_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False)
+        batch_decode = time.perf_counter() - start
+
+        if run == 0:
+            continue
+        timings["decode_image"].append(decode_image)
+        timings["preprocess"].append(preprocess)
+        timings["prefill"].append(prefill)
+        timings["per_token_decode"].append(max(full - prefill, 0.0) / max(generated - 1, 1))
+        timings["batch_decode"].append(batch_decode)
+        width, height = image.size
+        image_tokens = image_token_count(inputs)
+        prompt_tokens = int(inputs["input_ids"].shape[1])
+
+    result = {stage: statistics.median(values) for stage, values in timings.items()}
+    result["tokens_per_sec"] = 1.0 / result["per_token_decode"] if result["per_token_decode"] else 0.0
+    result.update(width=width, height=height, image_tokens=image_tokens, prompt_tokens=prompt_tokens)
+    result["rss_delta_mb"] = current_rss_mb() - rss_before
+    return result
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Return human-readable regressions of the run ``report`` against ``baseline``."""
+    regressions = []
+    for key, current in report["results"].items():
+        previous = baseline.get("results", {}).get(key)
+        if previous is None:
+            continue
+        for stage in LATENCY_STAGES:
+            if previous[stage] > 0 and current[stage] > previous[stage] * (1 + tolerance):
+                regressions.append(
+                    f"{key} {stage}: {current[stage] * 1000:.1f}ms vs baseline {previous[stage] * 1000:.1f}ms"
+                )
+        if current["image_tokens"] != previous["image_tokens"]:
+            regressions.append(f"{key} image_tokens: {current['image_tokens']} vs baseline {previous['image_tokens']}")
+    if baseline.get("peak_rss_mb") and report["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(f"peak_rss_mb: {report['peak_rss_mb']:.0f} vs baseline {baseline['peak_rss_mb']:.0f}")
+    return regressions
+
+
+def main() -> int:
+    """Run the suite, then save or check the baseline; return the exit code."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", type=int, nargs="+", default=RESOLUTIONS, help="Long sides to test, 0 for original")
+    parser.add_argument("--new-tokens", type=int, default=16, help="Tokens generated for the decode measurement")
+    parser.add_argument("--repeat", type=int, default=3, help="Measured runs per case (median is reported)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown before flagging a regression")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    vision_models, _ = setup_vision_models()
+    load_seconds = time.perf_counter() - start
+    ov_model, processor = vision_models["ov_model"], vision_models["processor"]
+    print(f"Model ready in {load_seconds:.1f}s, RSS {current_rss_mb():.0f} MiB")
+
+    results = {}
+    header = f"{'case':<32}{'decode':>9}{'preproc':>9}{'prefill':>9}{'ms/tok':>9}{'tok/s':>8}{'bdecode':>9}{'img tok':>9}{'ΔRSS MiB':>10}"
+    print(header)
+    for name, image_file, prompt in CASES:
+        for long_side in args.resolutions:
+            key = f"{name}@{long_side or 'orig'}"
+            r = bench_case(ov_model, processor, os.path.join(IMAGES_DIR, image_file), prompt, long_side, args.new_tokens, args.repeat)
+            results[key] = r
+            print(
+                f"{key:<32}{r['decode_image'] * 1000:>9.1f}{r['preprocess'] * 1000:>9.1f}{r['prefill'] * 1000:>9.1f}"
+                f"{r['per_token_decode'] * 1000:>9.1f}{r['tokens_per_sec']:>8.1f}{r['batch_decode'] * 1000:>9.2f}"
+                f"{r['image_tokens']:>9}{r['rss_delta_mb']:>+10.1f}"
+            )
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "load_seconds": load_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+    print(f"Peak RSS over the run: {report['peak_rss_mb']:.0f} MiB")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found, run with --save-baseline to create one.")
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(report, json.load(f), args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# benchmarks/bench_vision_startup.py
+"""
+Cold vs warm time-to-ready of the vision model.
+
+Each measurement runs ``setup_vision_models`` in a fresh Python process, so
+nothing is shared but the on-disk compiled-model cache and the OS page
+cache. The first run uses an empty cache directory (cold: read and
+compile); the following runs reuse it (warm: load cached blobs, mmap
+weights).
+
+Run from the repository root:
+    python -m benchmarks.bench_vision_startup --warm-runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+from models import setup_vision_models
+imported = time.perf_counter() - start
+_, timings = setup_vision_models(cache_dir=sys.argv[1])
+print(json.dumps({
+    "import_seconds": imported,
+    "ready_seconds": timings["ready_seconds"],
+    "total_seconds": time.perf_counter() - start,
+    "warm": timings["cache_warm"],
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def measure(cache_dir: str) -> dict:
+    """Start a fresh process, load the vision model and return its timings."""
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, cache_dir],
+        cwd=REPO_ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    """Measure one cold start and several warm starts and print a summary."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--warm-runs", type=int, default=3, help="Number of warm restarts to measure")
+    parser.add_argument("--cache-dir", help="Cache directory to use (default: a fresh temporary one)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = args.cache_dir or tmp
+        runs = [measure(cache_dir) for _ in range(args.warm_runs + 1)]
+
+    print(f"{'run':<8}{'cache':>7}{'imports':>10}{'ready':>10}{'total':>10}{'rss MiB':>10}")
+    for n, run in enumerate(runs):
+        label = "cold" if n == 0 else f"warm{n}"
+        print(
+            f"{label:<8}{'warm' if run['warm'] else 'cold':>7}{run['import_seconds']:>9.2f}s"
+            f"{run['ready_seconds']:>9.2f}s{run['total_seconds']:>9.2f}s{run['peak_rss_mb']:>10.0f}"
+        )
+    if len(runs) > 1:
+        cold = runs[0]["ready_seconds"]
+        warm = statistics.median(run["ready_seconds"] for run in runs[1:])
+        print(f"\nTime-to-ready: cold {cold:.2f}s, warm {warm:.2f}s ({cold / warm:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/compare_llm_backends.py
+"""
+Compare LLM backends on classification and routing.
+
+Runs the real ``NodeFunctions.classifier`` and ``ConditionalRouters.user_convo``
+prompts over a JSON-lines file of labelled customer messages (one object per
+line with ``request_id``, ``message``, ``classification`` and ``route``, a
+list of expected route nodes) for each backend, after checking with one real
+call per role that replies do not echo the prompt, and reports load time,
+per-call latency, throughput, accuracy against the labels and agreement with
+the first backend.
+
+Run from the repository root:
+    python -m benchmarks.compare_llm_backends --backends openai openvino
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from conditionals import ConditionalRouters
+from models import LLM_BACKENDS, setup_llm_models
+from nodes import NodeFunctions
+from schemas import create_initial_state
+
+DEFAULT_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "routing_samples.jsonl")
+
+
+def percentile(values, pct):
+    """Return the ``pct`` percentile of ``values`` (nearest-rank)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def load_samples(path: str) -> list:
+    """Read labelled messages from a JSON-lines file."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def as_route_set(route) -> frozenset:
+    """Normalise a router decision (node name or list of nodes) to a set."""
+    return frozenset([route] if isinstance(route, str) else route)
+
+
+# A line no sensible answer repeats, so finding it in the reply means the prompt was echoed
+ECHO_PROBE = "Reply with only the word OK. Reference code: ZX-41-PROBE."
+
+
+def check_no_prompt_echo(backend: str, models: dict) -> None:
+    """Make one real call per role and fail if the reply contains the prompt."""
+    for role in ("classifier_llm", "agent_conversation_llm"):
+        reply = models[role].invoke(ECHO_PROBE).content
+        if "ZX-41-PROBE" in reply:
+            raise SystemExit(f"{backend} {role} echoes the prompt in its reply: {reply!r:.200}")
+
+
+def evaluate(backend: str, samples: list, concurrency: int) -> dict:
+    """Classify and route every sample on ``backend``; return metrics and predictions."""
+    start = time.perf_counter()
+    models = setup_llm_models(classifier_backend=backend, agent_backend=backend)
+    load_seconds = time.perf_counter() - start
+    check_no_prompt_echo(backend, models)
+    node_funcs = NodeFunctions(models)
+    router_funcs = ConditionalRouters(models)
+
+    def run(sample: dict) -> tuple:
+        state = create_initial_state(sample["message"])
+        t0 = time.perf_counter()
+        classification = node_funcs.classifier(state)["classification"]
+        t1 = time.perf_counter()
+        route = as_route_set(router_funcs.user_convo(state))
+        t2 = time.perf_counter()
+        return classification, route, t1 - t0, t2 - t1
+
+    # The nodes print as they go; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        run(samples[0])  # Warm-up (first local inference compiles kernels)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(run, samples))
+        elapsed = time.perf_counter() - start
+
+    classifications = [r[0] for r in results]
+    routes = [r[1] for r in results]
+    return {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "classify_latency": [r[2] for r in results],
+        "route_latency": [r[3] for r in results],
+        "calls_per_sec": 2 * len(samples) / elapsed,
+        "classification_accuracy": statistics.mean(c == s["classification"] for c, s in zip(classifications, samples)),
+        "route_accuracy": statistics.mean(r == as_route_set(s["route"]) for r, s in zip(routes, samples)),
+        "classifications": classifications,
+        "routes": routes,
+    }
+
+
+def main() -> None:
+    """Evaluate each backend and print a comparison table."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=DEFAULT_DATA, help="Labelled JSON-lines file")
+    parser.add_argument("--backends", nargs="+", default=list(LLM_BACKENDS), choices=LLM_BACKENDS, help="Backends to compare")
+    parser.add_argument("--concurrency", type=int, default=1, help="Samples processed in parallel")
+    parser.add_argument("--show-disagreements", action="store_true", help="List messages where backends disagree")
+    args = parser.parse_args()
+
+    samples = load_samples(args.data)
+    reports = [evaluate(backend, samples, args.concurrency) for backend in args.backends]
+    reference = reports[0]
+
+    print(f"\n{len(samples)} samples from {args.data}, concurrency {args.concurrency}")
+    print(f"{'backend':<10}{'load':>8}{'cls p50':>10}{'cls p95':>10}{'route p50':>11}{'route p95':>11}{'calls/s':>9}{'cls acc':>9}{'route acc':>11}{'agree':>8}")
+    for report in reports:
+        agree = statistics.mean(
+            a == b and x == y
+            for a, b, x, y in zip(report["classifications"], reference["classifications"], report["routes"], reference["routes"])
+        )
+        print(
+            f"{report['backend']:<10}{report['load_seconds']:>7.1f}s"
+            f"{percentile(report['classify_latency'], 50) * 1000:>8.0f}ms{percentile(report['classify_latency'], 95) * 1000:>8.0f}ms"
+            f"{percentile(report['route_latency'], 50) * 1000:>9.0f}ms{percentile(report['route_latency'], 95) * 1000:>9.0f}ms"
+            f"{report['calls_per_sec']:>9.2f}{report['classification_accuracy']:>9.0%}{report['route_accuracy']:>11.0%}{agree:>8.0%}"
+        )
+
+    if args.show_disagreements:
+        for report in reports[1:]:
+            print(f"\nDisagreements {report['backend']} vs {reference['backend']}:")
+            for n, sample in enumerate(samples):
+                ours = (report["classifications"][n], sorted(report["routes"][n]))
+                theirs = (reference["classifications"][n], sorted(reference["routes"][n]))
+                if ours != theirs:
+                    print(f"  {sample['request_id']}: {sample['message']!r} -> {ours} vs {theirs}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/load_admission.py
+"""
+Synthetic load generator for the admission controller.
+
+Fires a Poisson stream of requests with a realistic route mix at an
+AdmissionController and reports, per route class, admitted/shed counts,
+queueing latency and how often callers would have degraded. Pass
+``--no-reserve`` to compare against a single shared pool.
+
+Run from the repository root:
+    python -m benchmarks.load_admission --rate 200 --duration 10
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+from admission import AdmissionController, AdmissionRejected
+
+# Route mix and simulated service time (seconds) of the guarded call
+ROUTE_MIX = {
+    "conversation": 0.8,
+    "refund": 0.2,
+}
+SERVICE_TIME = {
+    "conversation": 0.4,
+    "refund": 2.0,
+}
+PRIORITIES = {"refund": 0, "conversation": 1}
+RESERVED = {"refund": 2, "conversation": 4}
+QUEUE_LIMITS = {"refund": 32, "conversation": 128}
+
+
+def percentile(values, pct):
+    """Return the ``pct`` percentile of ``values`` (nearest-rank)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(rate: float, duration: float, max_concurrent: int, queue_timeout: float, reserve: bool, seed: int) -> None:
+    """Drive the controller with synthetic traffic and print a summary."""
+    rng = random.Random(seed)
+    controller = AdmissionController(
+        max_concurrent=max_concurrent,
+        priorities=PRIORITIES,
+        queue_limits=QUEUE_LIMITS,
+        reserved=RESERVED if reserve else None,
+        queue_timeout=queue_timeout,
+    )
+    routes = list(ROUTE_MIX)
+    weights = [ROUTE_MIX[route] for route in routes]
+
+    lock = threading.Lock()
+    waits = defaultdict(list)
+    degraded_samples = defaultdict(list)
+    threads = []
+
+    def request(route: str) -> None:
+        start = time.perf_counter()
+        with lock:
+            degraded_samples[route].append(controller.degraded(route))
+        try:
+            controller.acquire(route)
+        except AdmissionRejected:
+            return
+        with lock:
+            waits[route].append(time.perf_counter() - start)
+        try:
+            time.sleep(SERVICE_TIME[route] * rng.uniform(0.5, 1.5))
+        finally:
+            controller.release(route)
+
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        route = rng.choices(routes, weights)[0]
+        thread = threading.Thread(target=request, args=(route,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(rng.expovariate(rate))
+
+    for thread in threads:
+        thread.join()
+
+    print(f"Offered load: {len(threads)} requests over {duration:.0f}s at ~{rate:.0f} req/s")
+    print(f"Reserved slots: {controller.reserved}, shared: {controller.shared}")
+    print(f"{'route':<14}{'admitted':>10}{'shed':>8}{'timeout':>9}{'p50 wait':>11}{'p95 wait':>11}{'degraded':>10}")
+    for route in sorted(PRIORITIES, key=PRIORITIES.get):
+        stats = controller.stats[route]
+        print(
+            f"{route:<14}{stats['admitted']:>10}{stats['shed']:>8}{stats['timed_out']:>9}"
+            f"{percentile(waits[route], 50) * 1000:>9.1f}ms{percentile(waits[route], 95) * 1000:>9.1f}ms"
+            f"{100 * statistics.mean(degraded_samples[route] or [0]):>9.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=100.0, help="Mean arrivals per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of traffic to generate")
+    parser.add_argument("--max-concurrent", type=int, default=8, help="Controller concurrency limit")
+    parser.add_argument("--queue-timeout", type=float, default=5.0, help="Seconds before a queued request is shed")
+    parser.add_argument("--no-reserve", action="store_true", help="Share every slot instead of reserving some per route")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+    run(args.rate, args.duration, args.max_concurrent, args.queue_timeout, not args.no_reserve, args.seed)
@@ -0,0 +1,72 @@
+# benchmarks/replay_graph.py
+"""
+Replay recorded conversations through the support graph offline.
+
+Record a real session first:
+    CASSETTE_MODE=record CASSETTE_PATH=cassettes/refund.jsonl.gz python main.py
+
+Then rerun it through ``build_support_graph`` with recorded model responses
+and user input, at original (1.0), scaled or zero model latency:
+    python -m benchmarks.replay_graph cassettes/refund.jsonl.gz --scale 0 --runs 5
+
+Graph wall time minus the replayed model time is the time spent in our own
+code, so two commits can be compared exactly on the same cassette. ETA
+lookups and refund outcomes come from the cassette, and each run writes to
+fresh throwaway stores, so runs are identical and no real ledger, complaint
+log or escalation queue is touched.
+"""
+import argparse
+import statistics
+import time
+
+from cassette import Cassette
+from main import close_replay_stores, create_support_agent, setup_replay_stores
+from schemas import create_initial_state
+
+
+def recorded_model_seconds(path: str) -> dict:
+    """Sum recorded latency per model channel; user input and store lookups are replayed instantly."""
+    totals = Cassette(path, "replay").recorded_seconds()
+    return {channel: seconds for channel, seconds in totals.items() if channel != "input" and not channel.startswith("store.")}
+
+
+def replay_once(path: str, scale: float) -> tuple:
+    """Run the recorded conversation once; return (graph seconds, calls per channel)."""
+    cassette = Cassette(path, "replay", latency_scale=scale)
+    stores = setup_replay_stores()
+    try:
+        with cassette.user_input():
+            user_message = input("\nPlease describe your issue or complaint: ")
+            agent = create_support_agent(cassette=cassette, stores=stores)
+            start = time.perf_counter()
+            agent.invoke(create_initial_state(user_message))
+            elapsed = time.perf_counter() - start
+    finally:
+        close_replay_stores(stores)
+    return elapsed, dict(cassette.calls)
+
+
+def main() -> None:
+    """Replay a cassette several times and report graph-level timings."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cassette", help="Recorded cassette file")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier on recorded model latency (0 = instant)")
+    parser.add_argument("--runs", type=int, default=3, help="Number of replays")
+    args = parser.parse_args()
+
+    model_seconds = recorded_model_seconds(args.cassette)
+    runs = [replay_once(args.cassette, args.scale) for _ in range(args.runs)]
+    wall = [elapsed for elapsed, _ in runs]
+    calls = runs[-1][1]
+    replayed_model = sum(model_seconds.values()) * args.scale
+
+    print("\nChannel                              calls  recorded s")
+    for channel in sorted(set(calls) | set(model_seconds)):
+        print(f"{channel:<36}{calls.get(channel, 0):>6}{model_seconds.get(channel, 0.0):>12.3f}")
+    print(f"\nGraph wall time: median {statistics.median(wall):.3f}s, min {min(wall):.3f}s over {args.runs} runs")
+    print(f"Replayed model time: {replayed_model:.3f}s (scale {args.scale})")
+    print(f"Own overhead: {statistics.median(wall) - replayed_model:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+# cassette.py
+"""Record and replay of model I/O for deterministic, offline performance runs."""
+import builtins
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+import torch
+
+from eta_store import Order
+from refund_ledger import RefundEntry, RefundResult
+
+MODES = ("off", "record", "replay")
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def request_key(channel: str, request: Any) -> str:
+    """Stable hash identifying a request on a channel."""
+    payload = json.dumps([channel, request], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    A gzip-compressed JSON-lines file of model requests, responses and timings.
+
+    In record mode every call made through the wrappers below is forwarded
+    to the real model and appended to the cassette. In replay mode responses
+    are served from the cassette, in recorded order for identical requests,
+    after sleeping for the recorded latency times ``latency_scale`` (0 replays
+    instantly).
+    """
+
+    def __init__(self, path: str, mode: str = "record", latency_scale: float = 1.0):
+        """
+        Open a cassette.
+
+        Args:
+            path: Cassette file, conventionally ``*.jsonl.gz``
+            mode: "record" or "replay"
+            latency_scale: Multiplier applied to recorded latencies on replay
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Cassette mode must be 'record' or 'replay', not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._entries: List[Dict[str, Any]] = []
+        self._replay: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self.calls: Dict[str, int] = defaultdict(int)
+
+        if mode == "replay":
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._replay[entry["key"]].append(entry)
+
+    @property
+    def replaying(self) -> bool:
+        """Whether responses are served from the cassette."""
+        return self.mode == "replay"
+
+    def call(
+        self,
+        channel: str,
+        request: Any,
+        real: Callable[[], Any],
+        encode=lambda r: r,
+        decode=lambda r: r,
+        replay_latency: bool = True,
+    ) -> Any:
+        """
+        Run ``real`` (record) or serve the recorded response (replay).
+
+        Args:
+            channel: Name of the wrapped call, e.g. "classifier_llm.invoke"
+            request: JSON-serialisable description of the request
+            real: Zero-argument function performing the real call
+            encode: Converts the real response to JSON-serialisable form
+            decode: Converts the stored form back into a response
+            replay_latency: Whether replay sleeps for the recorded latency
+                (False for user think time and store lookups)
+
+        Returns:
+            The real or replayed response
+        """
+        key = request_key(channel, request)
+        with self._lock:
+            self.calls[channel] += 1
+
+        if self.replaying:
+            with self._lock:
+                pending = self._replay.get(key)
+                if not pending:
+                    raise CassetteMiss(f"No recorded response for {channel} request {request!r:.200}")
+                entry = pending.popleft()
+            delay = entry["seconds"] * self.latency_scale if replay_latency else 0
+            if delay > 0:
+                time.sleep(delay)
+            return decode(entry["response"])
+
+        start = time.perf_counter()
+        response = real()
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self._entries.append({
+                "channel": channel,
+                "key": key,
+                "request": request,
+                "response": encode(response),
+                "seconds": seconds,
+            })
+        return response
+
+    def recorded_seconds(self) -> Dict[str, float]:
+        """Total recorded latency per channel of a cassette opened for replay."""
+        totals: Dict[str, float] = defaultdict(float)
+        for entries in self._replay.values():
+            for entry in entries:
+                totals[entry["channel"]] += entry["seconds"]
+        return dict(totals)
+
+    def save(self) -> None:
+        """Write recorded entries to disk (no-op in replay mode)."""
+        if self.replaying:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            entries = list(self._entries)
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n")
+
+    @contextmanager
+    def user_input(self) -> Iterator[None]:
+        """Record or replay ``input()`` so whole conversations can be rerun unattended."""
+        original = builtins.input
+
+        def cassette_input(prompt: str = "") -> str:
+            if self.replaying:
+                print(prompt, end="")
+            # Time spent typing is not part of the run being replayed
+            answer = self.call("input", prompt, lambda: original(prompt), replay_latency=False)
+            if self.replaying:
+                print(answer)
+            return answer
+
+        builtins.input = cassette_input
+        try:
+            yield
+        finally:
+            builtins.input = original
+
+
+class _Message:
+    """Minimal stand-in for a chat message, exposing ``content`` like the real one."""
+
+    def __init__(self, content: str):
+        self.content = content
+
+
+class CassetteChatModel:
+    """Wraps a chat model's ``invoke`` (e.g. ``classifier_llm``)."""
+
+    def __init__(self, llm: Any, cassette: Cassette, channel: str):
+        self.llm = llm
+        self.cassette = cassette
+        self.channel = channel
+
+    def invoke(self, prompt: str) -> Any:
+        return self.cassette.call(
+            f"{self.channel}.invoke",
+            prompt,
+            lambda: self.llm.invoke(prompt),
+            encode=lambda message: message.content,
+            decode=_Message,
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.llm, name)
+
+
+class CassetteChain:
+    """Wraps a chain's ``run`` (e.g. ``agent_conversation_chain``)."""
+
+    def __init__(self, chain: Any, cassette: Cassette, channel: str):
+        self.chain = chain
+        self.cassette = cassette
+        self.channel = channel
+
+    def run(self, text: str) -> str:
+        return self.cassette.call(f"{self.channel}.run", text, lambda: self.chain.run(text))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.chain, name)
+
+
+class CassetteVisionModel:
+    """
+    Wraps ``ov_model`` so ``preprocess_inputs`` and ``generate`` are recorded and replayed.
+
+    Requests are keyed on the prompt text and a hash of the image pixels. On
+    replay the real model is not needed: ``preprocess_inputs`` returns a
+    placeholder of the recorded prompt length (callers slice the prompt off
+    with ``input_ids.shape[1]``) and ``generate`` returns the recorded token
+    ids, which the processor decodes as usual.
+    """
+
+    def __init__(self, ov_model: Any, cassette: Cassette, channel: str = "ov_model"):
+        self.ov_model = ov_model
+        self.cassette = cassette
+        self.channel = channel
+
+    def preprocess_inputs(self, text: str, image: Any, processor: Any) -> Dict[str, Any]:
+        request = {"text": text, "image_sha1": hashlib.sha1(image.tobytes()).hexdigest()}
+        holder = {}
+
+        def real() -> Dict[str, Any]:
+            holder["inputs"] = self.ov_model.preprocess_inputs(text=text, image=image, processor=processor)
+            return holder["inputs"]
+
+        result = self.cassette.call(
+            f"{self.channel}.preprocess_inputs",
+            request,
+            real,
+            encode=lambda inputs: int(inputs["input_ids"].shape[1]),
+        )
+        # On replay ``result`` is the recorded prompt length
+        inputs = holder["inputs"] if "inputs" in holder else {"input_ids": torch.zeros((1, result), dtype=torch.long)}
+        inputs["_cassette_request"] = request
+        return inputs
+
+    def generate(self, **kwargs: Any) -> Any:
+        request = dict(kwargs.pop("_cassette_request"))
+        request["max_new_tokens"] = kwargs.get("max_new_tokens")
+        request["do_sample"] = kwargs.get("do_sample")
+        return self.cassette.call(
+            f"{self.channel}.generate",
+            request,
+            lambda: self.ov_model.generate(**kwargs),
+            encode=lambda ids: ids.tolist(),
+            decode=torch.tensor,
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.ov_model, name)
+
+
+class CassetteETAStore:
+    """
+    Wraps an ``OrderRiderStore`` so order lookups and ETAs are recorded and replayed.
+
+    ETA tool results end up in the agent prompts that key the cassette, so
+    they must come back exactly as recorded while the live store keeps moving.
+    On replay the wrapped store is never queried.
+    """
+
+    def __init__(self, store: Any, cassette: Cassette, channel: str = "store.eta"):
+        self.store = store
+        self.cassette = cassette
+        self.channel = channel
+
+    def get_order(self, order_id: str) -> Optional[Order]:
+        def decode(fields: Optional[Dict[str, Any]]) -> Optional[Order]:
+            if fields is None:
+                return None
+            return Order(**{**fields, "pickup": tuple(fields["pickup"]), "dropoff": tuple(fields["dropoff"])})
+
+        return self.cassette.call(
+            f"{self.channel}.get_order",
+            order_id,
+            lambda: self.store.get_order(order_id),
+            encode=lambda order: None if order is None else asdict(order),
+            decode=decode,
+            replay_latency=False,
+        )
+
+    def eta_minutes(self, order_id: str) -> Optional[float]:
+        return self.cassette.call(
+            f"{self.channel}.eta_minutes",
+            order_id,
+            lambda: self.store.eta_minutes(order_id),
+            replay_latency=False,
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.store, name)
+
+
+class CassetteRefundLedger:
+    """
+    Wraps a ``RefundLedger`` so refund outcomes are recorded and replayed.
+
+    Whether a claim was refunded, a duplicate or failed to commit depends on
+    what the real ledger already held when recording; replay returns (or
+    raises) the same outcome without writing to the ledger.
+    """
+
+    def __init__(self, ledger: Any, cassette: Cassette, channel: str = "store.refund_ledger"):
+        self.ledger = ledger
+        self.cassette = cassette
+        self.channel = channel
+
+    def refund(self, session_id: str, order_id: str, product: str, amount: int, image_hash: str = "") -> RefundResult:
+        request = {
+            "session_id": session_id,
+            "order_id": order_id,
+            "product": product,
+            "amount": amount,
+            "image_hash": image_hash,
+        }
+
+        def real() -> Dict[str, Any]:
+            try:
+                return {"result": asdict(self.ledger.refund(session_id, order_id, product, amount, image_hash))}
+            except IOError as e:
+                return {"error": str(e)}
+
+        def decode(outcome: Dict[str, Any]) -> RefundResult:
+            if "error" in outcome:
+                raise IOError(outcome["error"])
+            result = outcome["result"]
+            return RefundResult(result["refunded"], RefundEntry(**result["entry"]), result["reason"])
+
+        # ``real`` reports write failures as data so they are recorded too
+        outcome = self.cassette.call(f"{self.channel}.refund", request, real, replay_latency=False)
+        return decode(outcome)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.ledger, name)
+
+
+def wrap_stores_with_cassette(stores: Dict[str, Any], cassette: Cassette) -> Dict[str, Any]:
+    """Route the ETA and refund lookups the tool nodes make through ``cassette``."""
+    wrapped = dict(stores)
+    wrapped["eta_store"] = CassetteETAStore(stores["eta_store"], cassette)
+    wrapped["refund_ledger"] = CassetteRefundLedger(stores["refund_ledger"], cassette)
+    return wrapped
@@ -0,0 +1,272 @@
+# complaint_log.py
+"""Write-behind, group-committed persistence for service complaints."""
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS complaints (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    session_id TEXT,
+    order_id TEXT,
+    rider_id TEXT,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_complaints_rider_day ON complaints (rider_id, day);
+"""
+
+# Maps the fsync setting to SQLite's synchronous pragma
+SYNC_MODES = {"off": "OFF", "normal": "NORMAL", "full": "FULL"}
+
+
+class ComplaintSink:
+    """
+    Buffered complaint log backed by an append-only SQLite table.
+
+    ``record`` only enqueues into a bounded in-memory buffer; a background
+    writer commits buffered complaints in one transaction whenever
+    ``batch_size`` are waiting or the oldest has waited ``flush_interval``
+    seconds. When the buffer is full, ``record`` blocks for up to
+    ``put_timeout`` seconds before dropping the complaint. A batch that fails
+    to commit is kept and retried every ``retry_interval`` seconds on a fresh
+    connection, so a transient SQLite error never loses the writer.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        buffer_size: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 0.5,
+        fsync: str = "normal",
+        put_timeout: float = 1.0,
+        retry_interval: float = 1.0,
+    ):
+        """
+        Open the store and start the writer thread.
+
+        Args:
+            path: SQLite database file
+            buffer_size: Maximum complaints held in memory awaiting commit
+            batch_size: Commit as soon as this many complaints are buffered
+            flush_interval: Commit at least this often (seconds) when non-empty
+            fsync: "off", "normal" or "full" durability on commit
+            put_timeout: Seconds ``record`` waits for buffer space
+            retry_interval: Seconds between attempts to commit a failed batch
+        """
+        if fsync not in SYNC_MODES:
+            raise ValueError(f"fsync must be one of {sorted(SYNC_MODES)}")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.put_timeout = put_timeout
+        self.retry_interval = retry_interval
+
+        self._buffer: "queue.Queue[Tuple]" = queue.Queue(maxsize=buffer_size)
+        self._stop = threading.Event()
+        self._flushed = threading.Condition()
+        self._enqueued = 0
+        self._committed = 0
+        self._writer_done = False
+        self.stats = {
+            "committed": 0,
+            "dropped": 0,
+            "batches": 0,
+            "write_errors": 0,
+            "commit_seconds": 0.0,
+            "max_flush_latency": 0.0,
+        }
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        self._writer = threading.Thread(target=self._run, name="complaint-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={SYNC_MODES[self.fsync]}")
+        return conn
+
+    def record(
+        self,
+        message: str,
+        session_id: Optional[str] = None,
+        order_id: Optional[str] = None,
+        rider_id: Optional[str] = None,
+    ) -> bool:
+        """
+        Buffer a complaint for the next group commit.
+
+        Returns:
+            True if buffered, False if dropped because the buffer stayed full
+            or the sink is closed
+        """
+        if self._stop.is_set() or self._writer_done:
+            with self._flushed:
+                self.stats["dropped"] += 1
+            return False
+        now = time.time()
+        day = datetime.fromtimestamp(now, tz=timezone.utc).strftime("%Y-%m-%d")
+        try:
+            self._buffer.put((now, day, session_id, order_id, rider_id, message), timeout=self.put_timeout)
+        except queue.Full:
+            with self._flushed:
+                self.stats["dropped"] += 1
+            return False
+        with self._flushed:
+            if self._writer_done:
+                # The writer stopped between the check above and the put, so
+                # nothing will commit this complaint
+                self._discard_buffered()
+                return False
+            self._enqueued += 1
+        return True
+
+    def _discard_buffered(self) -> None:
+        """Drop everything still buffered, which can no longer be committed (caller holds ``_flushed``)."""
+        while True:
+            try:
+                self._buffer.get_nowait()
+            except queue.Empty:
+                break
+            self.stats["dropped"] += 1
+
+    def _drain(self, first: Tuple) -> List[Tuple]:
+        batch = [first]
+        deadline = first[0] + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            try:
+                if remaining <= 0:
+                    batch.append(self._buffer.get_nowait())
+                else:
+                    batch.append(self._buffer.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, conn: Optional[sqlite3.Connection], batch: List[Tuple]) -> Optional[sqlite3.Connection]:
+        """
+        Commit ``batch``, retrying on SQLite errors until it succeeds.
+
+        Returns:
+            The connection to keep using, or None if the sink is closing and
+            the batch still could not be committed (it is dropped)
+        """
+        attempts = 0
+        while True:
+            try:
+                if conn is None:
+                    conn = self._connect()
+                start = time.time()
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO complaints (created_at, day, session_id, order_id, rider_id, message) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        batch,
+                    )
+                done = time.time()
+                break
+            except sqlite3.Error as e:
+                attempts += 1
+                print(f"Complaint log commit failed (attempt {attempts}), retrying: {e}")
+                with self._flushed:
+                    self.stats["write_errors"] += 1
+                if conn is not None:
+                    conn.close()
+                    conn = None
+                # Once closing, give up after a few attempts instead of blocking shutdown
+                if self._stop.is_set() and attempts >= 3:
+                    with self._flushed:
+                        self.stats["dropped"] += len(batch)
+                    return None
+                self._stop.wait(self.retry_interval)
+
+        with self._flushed:
+            self.stats["batches"] += 1
+            self.stats["committed"] += len(batch)
+            self.stats["commit_seconds"] += done - start
+            self.stats["max_flush_latency"] = max(self.stats["max_flush_latency"], done - batch[0][0])
+            self._committed += len(batch)
+            self._flushed.notify_all()
+        return conn
+
+    def _run(self) -> None:
+        conn = None
+        try:
+            while not (self._stop.is_set() and self._buffer.empty()):
+                try:
+                    first = self._buffer.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                conn = self._commit(conn, self._drain(first))
+                if conn is None:
+                    break
+        finally:
+            if conn is not None:
+                conn.close()
+            with self._flushed:
+                self._discard_buffered()
+                self._writer_done = True
+                self._flushed.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until everything recorded so far has been committed.
+
+        Returns:
+            True if the buffer was fully committed within ``timeout``, False
+            on timeout or if the writer stopped first
+        """
+        with self._flushed:
+            target = self._enqueued
+            self._flushed.wait_for(lambda: self._committed >= target or self._writer_done, timeout)
+            return self._committed >= target
+
+    def close(self) -> None:
+        """Commit remaining complaints and stop the writer thread."""
+        self._stop.set()
+        self._writer.join()
+
+    def complaints_per_rider_per_day(
+        self,
+        since_day: Optional[str] = None,
+        min_count: int = 1,
+    ) -> List[Tuple[str, str, int]]:
+        """
+        Aggregate committed complaints by rider and UTC day.
+
+        Args:
+            since_day: Only include days on or after this "YYYY-MM-DD"
+            min_count: Only include rider-days with at least this many complaints
+
+        Returns:
+            List of (rider_id, day, count) tuples, busiest first
+        """
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT rider_id, day, COUNT(*) AS n FROM complaints "
+                "WHERE rider_id IS NOT NULL AND day >= ? "
+                "GROUP BY rider_id, day HAVING n >= ? ORDER BY n DESC, day, rider_id",
+                (since_day or "", min_count),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def count(self) -> int:
+        """Return the number of committed complaints."""
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM complaints").fetchone()[0]
+        finally:
+            conn.close()
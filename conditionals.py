@@ -1,16 +1,96 @@
 # conditionals.py
 """Conditional routing functions for the workflow graph."""
-from typing import Dict, Any
+import re
+from contextlib import nullcontext
+from typing import Dict, Any, List, Optional, Union
 from langgraph.constants import END
 
+from admission import AdmissionController, AdmissionRejected
 from schemas import SomeState
 
+ETA_KEYWORDS = ("eta", "arrive", "arrival", "when will", "how long", "waiting", "where is my order", "delivery time")
+COMPLAINT_KEYWORDS = ("rude", "unprofessional", "impolite", "behavior", "behaviour", "poor service", "driver was", "delivery person")
+DONE_KEYWORDS = ("thanks", "thank you", "that's all", "thats all", "no further", "resolved", "bye")
+
+# Router answers mapped to the graph nodes they select
+ROUTE_OPTIONS = {
+    "ETA tool": "ETA tool",
+    "Service complaint": "Service complaint Tool",
+    "Service complaint Tool": "Service complaint Tool",
+    "check": "check",
+    "Agent": "Agent",
+}
+TOOL_NODES = ("ETA tool", "Service complaint Tool")
+# Numbered or bulleted list markers ("1.", "2)", "-", "*") in front of an answer
+LIST_MARKER = re.compile(r"^\s*(?:\d+[.)]|[-*])\s*")
+
+
+def _mentions(message: str, keywords) -> bool:
+    """Return True if any keyword occurs in ``message`` as whole words."""
+    return any(re.search(rf"\b{re.escape(keyword)}\b", message) for keyword in keywords)
+
+
+def heuristic_route(user_message: str) -> Union[str, List[str]]:
+    """
+    Cheap keyword-based stand-in for the LLM router used under load.
+    
+    Args:
+        user_message: The user's latest message
+        
+    Returns:
+        List of tool nodes to run in parallel, or a single next node name
+    """
+    message = user_message.lower()
+    tools = []
+    if _mentions(message, ETA_KEYWORDS):
+        tools.append("ETA tool")
+    if _mentions(message, COMPLAINT_KEYWORDS):
+        tools.append("Service complaint Tool")
+    if tools:
+        return tools
+    if _mentions(message, DONE_KEYWORDS):
+        return "check"
+    return "Agent"
+
+def parse_route_decision(route_decision: str) -> Union[str, List[str]]:
+    """
+    Parse the router LLM's answer into graph nodes.
+    
+    The answer is split on commas and newlines and each part, stripped of
+    quotes and list markers, must exactly match one of ``ROUTE_OPTIONS``.
+    Unknown parts are ignored, so words merely mentioned in a longer answer
+    never select a tool.
+    
+    Args:
+        route_decision: Raw text returned by the LLM
+        
+    Returns:
+        List of tool nodes to run in parallel, or a single next node name
+    """
+    nodes = []
+    for part in re.split(r"[,\n]", route_decision):
+        option = LIST_MARKER.sub("", part).strip().strip("\"'`*.) ").strip()
+        node = ROUTE_OPTIONS.get(option)
+        if node is not None and node not in nodes:
+            nodes.append(node)
+    tools = [node for node in nodes if node in TOOL_NODES]
+    if tools:
+        return tools
+    if "check" in nodes:
+        return "check"
+    return "Agent"
+
 class ConditionalRouters:
     """Collection of conditional routing functions for the workflow graph."""
     
-    def __init__(self, models: Dict[str, Any]):
-        """Initialize with required models."""
+    def __init__(self, models: Dict[str, Any], admission: Optional[AdmissionController] = None):
+        """Initialize with required models and optional admission control."""
         self.agent_conversation_llm = models.get("agent_conversation_llm")
+        self.admission = admission
+
+    def _admit(self, route: str):
+        """Return an admission context for ``route``, or a no-op without a controller."""
+        return self.admission.admit(route) if self.admission is not None else nullcontext()
     
     def refundable_or_not(self, state: SomeState) -> str:
         """
@@ -44,9 +124,12 @@ class ConditionalRouters:
         else:
             return "Human in loop"
 
-    def user_convo(self, state: SomeState) -> str:
+    def amount_verified_or_not(self, state: SomeState) -> str:
         """
-        Route based on user conversation intent analysis.
+        Route based on whether a refund amount was read off the bill.
+        
+        A claim without an amount (bill unreadable, or the check deferred
+        under load) goes to a human instead of being dropped.
         
         Args:
             state: Current workflow state
@@ -54,13 +137,39 @@ class ConditionalRouters:
         Returns:
             Next node name
         """
+        print("\n[Condition: amount_verified_or_not]")
+        if state.get("refund_amount"):
+            return "Refund Tool"
+        else:
+            return "Human in loop"
+
+    def user_convo(self, state: SomeState) -> Union[str, List[str]]:
+        """
+        Route based on user conversation intent analysis.
+        
+        A message can carry several intents ("where is my order and the driver
+        was rude"); all matching tools are returned so the graph fans out to
+        them concurrently and the agent replies once to their merged results.
+        
+        Args:
+            state: Current workflow state
+            
+        Returns:
+            List of tool nodes to run in parallel, or a single next node name
+        """
         print("\n[Condition: user_convo]")
 
+        # Skip the LLM round trip entirely when the system is under pressure
+        if self.admission is not None and self.admission.degraded("conversation"):
+            route = heuristic_route(state["user_message"])
+            print(f"user_convo degraded heuristic => {route}")
+            return route
+
         # Create a structured prompt for routing
         route_prompt = f"""
         The user last said: "{state['user_message']}".
 
-        Analyze the message and choose the most appropriate route:
+        Analyze the message and choose the appropriate routes:
 
         1) Route to "ETA tool" if ANY of these apply:
            - User is asking when their order will arrive
@@ -79,24 +188,25 @@ class ConditionalRouters:
 
         4) Route to "Agent" ONLY if none of the above apply.
 
-        Return EXACTLY ONE of these four options (case sensitive):
+        "ETA tool" and "Service complaint" can both apply to the same message;
+        if they do, return both separated by a comma. Otherwise return EXACTLY
+        ONE of these options (case sensitive):
         "ETA tool"
         "Service complaint"
         "check"
         "Agent"
         """
 
-        route_decision = self.agent_conversation_llm.invoke(route_prompt).content.strip()
+        try:
+            with self._admit("conversation"):
+                route_decision = self.agent_conversation_llm.invoke(route_prompt).content.strip()
+        except AdmissionRejected as e:
+            route = heuristic_route(state["user_message"])
+            print(f"{e}; user_convo heuristic => {route}")
+            return route
         print(f"user_convo decision text => {route_decision}")
 
-        if "ETA tool" in route_decision:
-            return "ETA tool"
-        elif "Service complaint" in route_decision:
-            return "Service complaint Tool"
-        elif "check" in route_decision:
-            return "check"
-        else:
-            return "Agent"
+        return parse_route_decision(route_decision)
 
     def satisfied_or_not(self, state: SomeState) -> str:
         """
@@ -7,14 +7,29 @@ import os
 
 load_dotenv()  # This loads environment variables from .env
 
+# LLM backends per role: "openai" (remote) or "openvino" (local CPU model)
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "openai")  # Complaint classification
+AGENT_BACKEND = os.getenv("AGENT_BACKEND", "openai")  # Routing and agent replies
+
+# Record/replay of model I/O ("off", "record" or "replay")
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassettes/session.jsonl.gz")
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "1.0"))  # 0 replays instantly
+
+# Only checked when an "openai" chat model is built, so replay and vision-only tools run without it
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("Missing OpenAI API Key!")
 
 # Model configurations
 CLASSIFIER_MODEL = "gpt-3.5-turbo"
 AGENT_MODEL = "gpt-3.5-turbo"
+LOCAL_CLASSIFIER_MODEL = "OpenVINO/Qwen2.5-1.5B-Instruct-int4-ov"  # Used when CLASSIFIER_BACKEND is "openvino"
+LOCAL_AGENT_MODEL = "OpenVINO/Qwen2.5-1.5B-Instruct-int4-ov"  # Used when AGENT_BACKEND is "openvino"
+LOCAL_LLM_DEVICE = "CPU"
+LOCAL_LLM_MAX_NEW_TOKENS = 128  # Classification and routing answers are a few tokens
 VISION_MODEL = "OpenVINO/Phi-3.5-vision-instruct-int4-ov"
+VISION_DEVICE = "CPU"  # OpenVINO device the vision model is compiled for
+VISION_OV_CONFIG = {}  # Extra OpenVINO compile properties, part of the cache key
+VISION_CACHE_DIR = "model_cache"  # Compiled-model blobs, shared by workers on one host
 
 # System prompts
 AGENT_SYSTEM_PROMPT = """
@@ -27,4 +42,46 @@ You are a food delivery support agent. Follow these critical rules:
 """
 
 # Constants
-DEBUG = True  # Enable/disable debug logging
\ No newline at end of file
+DEBUG = True  # Enable/disable debug logging
+
+# Admission control
+ADMISSION_MAX_CONCURRENT = 8  # Blocking model calls allowed at once
+ADMISSION_PRIORITIES = {  # Lower value gets shared slots first
+    "refund": 0,  # Vision checks on refund claims
+    "conversation": 1,  # Classifier, router and agent LLM calls
+}
+ADMISSION_RESERVED = {  # Slots only that route may use; the rest are shared
+    "refund": 2,
+    "conversation": 4,
+}
+ADMISSION_QUEUE_LIMITS = {  # Maximum waiting requests per route
+    "refund": 32,
+    "conversation": 128,
+}
+ADMISSION_DEGRADE_THRESHOLD = 0.75  # Busy fraction of a route's capacity at which its cheap fallbacks kick in
+ADMISSION_QUEUE_TIMEOUT = 5.0  # Seconds a request may wait before being shed
+
+# ETA lookup
+ETA_GRID_CELL_DEG = 0.01  # Spatial grid cell edge (~1.1 km)
+ETA_SIMULATOR_ENABLED = True  # Feed the ETA store from the local rider simulator
+ETA_SIMULATOR_RIDERS = 200  # Simulated riders, one active order (ORD-0000...) each
+ETA_SIMULATOR_INTERVAL = 1.0  # Seconds between simulated location batches
+
+# Complaint log
+COMPLAINT_DB_PATH = "complaints.db"  # Append-only SQLite store
+COMPLAINT_BUFFER_SIZE = 10000  # Complaints held in memory awaiting commit
+COMPLAINT_BATCH_SIZE = 256  # Group-commit once this many are buffered
+COMPLAINT_FLUSH_INTERVAL = 0.5  # ...or once the oldest has waited this many seconds
+COMPLAINT_FSYNC = "normal"  # "off", "normal" or "full"
+
+# Refund ledger
+REFUND_LEDGER_PATH = "refund_ledger.log"  # Append-only write-ahead log
+REFUND_FSYNC = True  # fsync each group commit before confirming refunds
+REFUND_MAX_BATCH_DELAY = 0.002  # Seconds the writer waits to gather a batch
+
+# Human escalation
+ESCALATION_DB_PATH = "escalations.db"  # Base name of the per-shard case databases, shared with the agent console
+ESCALATION_SHARDS = 4  # Independently locked and stored queue shards, fixed per ESCALATION_DB_PATH
+ESCALATION_LEASE_SECONDS = 300.0  # Unacknowledged cases are requeued after this
+ESCALATION_BUNDLE_WORKERS = 2  # Threads building context bundles
+ESCALATION_THUMBNAIL_DIR = "escalation_thumbnails"  # Where case thumbnails are written
@@ -0,0 +1,541 @@
+# escalation.py
+"""Sharded, prioritised human escalation queue with precomputed context bundles."""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from schemas import SomeState
+
+# Lower value is handled first
+PRIORITY_REFUND = 0
+PRIORITY_UNRESOLVED = 1
+PRIORITY_OTHER = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS escalations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_id TEXT UNIQUE NOT NULL,
+    session_id TEXT,
+    priority INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    state TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_token TEXT,
+    lease_expires REAL NOT NULL DEFAULT 0,
+    first_leased_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    bundle TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_escalations_open ON escalations (done, seq);
+"""
+
+
+def shard_path(path: str, shard: int) -> str:
+    """Return the database file of one shard, e.g. "escalations.1.db" for "escalations.db"."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{shard}{ext}"
+
+
+@dataclass
+class ContextBundle:
+    """Everything a human agent needs to act on an escalated case."""
+    transcript_summary: str
+    thumbnails: Dict[str, str]
+    vision_verdict: Optional[bool]
+    extracted_price: Optional[int]
+    product: Optional[str]
+    build_seconds: float
+
+
+@dataclass
+class EscalationCase:
+    """A session waiting for, or being handled by, a human agent."""
+    case_id: str
+    session_id: str
+    priority: int
+    reason: str
+    state: Dict[str, Any]
+    enqueued_at: float
+    shard: int
+    bundle_future: Future = field(repr=False, default=None)
+    lease_owner: Optional[str] = None
+    lease_token: Optional[str] = None
+    lease_expires: float = 0.0
+    first_leased_at: Optional[float] = None
+    attempts: int = 0
+
+    def bundle(self, timeout: Optional[float] = None) -> ContextBundle:
+        """Return the context bundle, waiting for the background build if needed."""
+        return self.bundle_future.result(timeout)
+
+
+def summarize_transcript(state: SomeState, max_turns: int = 3) -> str:
+    """
+    Condense the free-form ``notes`` log into a short case summary.
+
+    Args:
+        state: Workflow state of the escalated session
+        max_turns: Number of most recent agent exchanges to keep
+
+    Returns:
+        Multi-line summary
+    """
+    lines = [f"Initial complaint: {state.get('user_first_message', '')}"]
+    lines.append(f"Classification: {state.get('classification') or 'unknown'}")
+
+    events, turns = [], []
+    for block in state.get("notes", "").split("\n["):
+        block = block.strip().lstrip("[")
+        if not block:
+            continue
+        tag, _, text = block.partition("]")
+        if tag == "Agent conversation":
+            turns.append(" ".join(text.split()))
+        else:
+            events.append(f"{tag}: {text.strip()}")
+
+    if turns:
+        lines.append(f"Agent exchanges: {len(turns)} (last {min(max_turns, len(turns))} shown)")
+        lines.extend(f"  {turn}" for turn in turns[-max_turns:])
+    if events:
+        lines.append("Events:")
+        lines.extend(f"  {event}" for event in events)
+    return "\n".join(lines)
+
+
+class EscalationQueue:
+    """
+    Work queue for human agents, sharded by session and ordered by priority.
+
+    Cases are leased rather than popped: a lease expires after
+    ``lease_seconds`` unless acknowledged, and expired cases go back into
+    their shard so a crashed agent never loses work. Context bundles are
+    built on a background pool as soon as a case is enqueued, so they are
+    usually ready by the time an agent leases the case.
+
+    Each shard writes its cases, leases and built bundles through to its
+    own SQLite database (see ``shard_path``) with its own connection and
+    lock, so enqueues and leases in different shards never wait on each
+    other. The queue survives the support process exiting and can be
+    consumed from another process (see ``python escalation.py --help``),
+    as long as every process uses the same ``num_shards`` for a path. The
+    in-memory heaps only order the work; every lease, ack and release is
+    a conditional update on the shard's table, so two consumers never hold
+    the same case.
+    """
+
+    def __init__(
+        self,
+        path: str = "escalations.db",
+        num_shards: int = 4,
+        lease_seconds: float = 300.0,
+        bundle_workers: int = 2,
+        thumbnail_dir: str = "escalation_thumbnails",
+        thumbnail_size: Tuple[int, int] = (256, 256),
+        latency_window: int = 1000,
+    ):
+        """
+        Open (or create) the queue and load the cases still open in it.
+
+        Args:
+            path: SQLite database file name, one file per shard is derived from it
+            num_shards: Number of independently locked and stored shards
+            lease_seconds: How long a lease lasts before the case is requeued
+            bundle_workers: Threads building context bundles in the background
+            thumbnail_dir: Directory thumbnails are written to
+            thumbnail_size: Maximum thumbnail width and height
+            latency_window: Number of recent queue-to-first-action latencies kept
+        """
+        self.num_shards = num_shards
+        self.lease_seconds = lease_seconds
+        self.thumbnail_dir = thumbnail_dir
+        self.thumbnail_size = thumbnail_size
+
+        self._shards: List[List[Tuple[int, float, int, str]]] = [[] for _ in range(num_shards)]
+        self._locks = [threading.Lock() for _ in range(num_shards)]
+        self._cases: Dict[str, EscalationCase] = {}
+        self._leased: Dict[str, EscalationCase] = {}
+        self._elsewhere: Dict[str, float] = {}  # Cases leased by another process -> lease expiry
+        self._cases_lock = threading.Lock()
+        self._seq = itertools.count()
+        self._pool = ThreadPoolExecutor(max_workers=bundle_workers, thread_name_prefix="escalation-bundle")
+        self.first_action_latencies: Deque[float] = deque(maxlen=latency_window)
+
+        self._db_locks = [threading.Lock() for _ in range(num_shards)]
+        self._dbs = [self._open_shard(shard_path(path, n)) for n in range(num_shards)]
+        self._last_rows = [0] * num_shards
+        self._load_new()
+
+    @staticmethod
+    def _open_shard(path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(SCHEMA)
+        return db
+
+    def shard_for(self, session_id: str) -> int:
+        """Return the shard a session's cases live in."""
+        return zlib.crc32(session_id.encode("utf-8")) % self.num_shards
+
+    def enqueue(self, state: SomeState, reason: str, priority: int = PRIORITY_OTHER) -> EscalationCase:
+        """
+        Add an escalated session and start building its context bundle.
+
+        Args:
+            state: Workflow state at the point of escalation
+            reason: Why the session was escalated
+            priority: Case priority (lower is handled first)
+
+        Returns:
+            The queued case
+        """
+        snapshot = dict(state)
+        case = EscalationCase(
+            case_id=uuid.uuid4().hex,
+            session_id=snapshot.get("session_id", ""),
+            priority=priority,
+            reason=reason,
+            state=snapshot,
+            enqueued_at=time.time(),
+            shard=self.shard_for(snapshot.get("session_id", "")),
+        )
+        with self._db_locks[case.shard], self._dbs[case.shard]:
+            self._dbs[case.shard].execute(
+                "INSERT INTO escalations (case_id, session_id, priority, reason, state, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (case.case_id, case.session_id, priority, reason,
+                 json.dumps(snapshot, default=str), case.enqueued_at),
+            )
+        case.bundle_future = self._pool.submit(self._build_bundle, case)
+        with self._cases_lock:
+            self._cases[case.case_id] = case
+        self._push(case)
+        return case
+
+    def _load_new(self) -> None:
+        """Pick up open cases written by other processes since the last call."""
+        for shard in range(self.num_shards):
+            self._load_new_shard(shard)
+
+    def _load_new_shard(self, shard: int) -> None:
+        with self._db_locks[shard]:
+            rows = self._dbs[shard].execute(
+                "SELECT seq, case_id, session_id, priority, reason, state, enqueued_at, "
+                "lease_expires, first_leased_at, attempts, bundle FROM escalations WHERE done = 0 AND seq > ? ORDER BY seq",
+                (self._last_rows[shard],),
+            ).fetchall()
+        now = time.time()
+        for seq, case_id, session_id, priority, reason, state, enqueued_at, lease_expires, first_leased_at, attempts, bundle in rows:
+            self._last_rows[shard] = seq
+            with self._cases_lock:
+                if case_id in self._cases:
+                    continue
+                case = EscalationCase(
+                    case_id=case_id,
+                    session_id=session_id,
+                    priority=priority,
+                    reason=reason,
+                    state=json.loads(state),
+                    enqueued_at=enqueued_at,
+                    shard=shard,
+                    first_leased_at=first_leased_at,
+                    attempts=attempts,
+                )
+                self._cases[case_id] = case
+                if lease_expires > now:
+                    self._elsewhere[case_id] = lease_expires
+            if bundle:
+                case.bundle_future = Future()
+                case.bundle_future.set_result(ContextBundle(**json.loads(bundle)))
+            else:
+                case.bundle_future = self._pool.submit(self._build_bundle, case)
+            if lease_expires <= now:
+                self._push(case)
+
+    def _push(self, case: EscalationCase) -> None:
+        with self._locks[case.shard]:
+            heapq.heappush(self._shards[case.shard], (case.priority, case.enqueued_at, next(self._seq), case.case_id))
+
+    def _build_bundle(self, case: EscalationCase) -> ContextBundle:
+        start = time.perf_counter()
+        state = case.state
+        thumbnails = {}
+        for kind in ("image_problem_path", "image_bill_path"):
+            path = state.get(kind)
+            if path:
+                thumbnail = self._thumbnail(case.case_id, kind, path)
+                if thumbnail:
+                    thumbnails[kind] = thumbnail
+        verified = state.get("verified") if state.get("classification") == "refundable" else None
+        bundle = ContextBundle(
+            transcript_summary=summarize_transcript(state),
+            thumbnails=thumbnails,
+            vision_verdict=verified,
+            extracted_price=state.get("refund_amount") or None,
+            product=state.get("refund_prdct") or None,
+            build_seconds=time.perf_counter() - start,
+        )
+        with self._db_locks[case.shard], self._dbs[case.shard]:
+            self._dbs[case.shard].execute(
+                "UPDATE escalations SET bundle = ? WHERE case_id = ?", (json.dumps(asdict(bundle)), case.case_id)
+            )
+        return bundle
+
+    def _thumbnail(self, case_id: str, kind: str, path: str) -> Optional[str]:
+        try:
+            os.makedirs(self.thumbnail_dir, exist_ok=True)
+            with Image.open(path) as image:
+                image.draft("RGB", self.thumbnail_size)
+                image = image.convert("RGB")
+                image.thumbnail(self.thumbnail_size)
+                out_path = os.path.join(self.thumbnail_dir, f"{case_id}_{kind}.jpg")
+                image.save(out_path, "JPEG", quality=80)
+            return out_path
+        except (OSError, ValueError) as e:
+            print(f"Could not build thumbnail for {path}: {e}")
+            return None
+
+    def _requeue_expired(self) -> None:
+        now = time.time()
+        with self._cases_lock:
+            expired = [case for case in self._leased.values() if case.lease_expires <= now]
+            for case in expired:
+                del self._leased[case.case_id]
+                case.lease_owner = case.lease_token = None
+            for case_id, expires in list(self._elsewhere.items()):
+                if expires <= now:
+                    del self._elsewhere[case_id]
+                    expired.append(self._cases[case_id])
+        for case in expired:
+            self._push(case)
+
+    def _claim(self, case: EscalationCase, agent_id: str, token: str, now: float) -> bool:
+        """Record the lease in the table unless the case is done or leased by another process."""
+        db = self._dbs[case.shard]
+        with self._db_locks[case.shard], db:
+            claimed = db.execute(
+                "UPDATE escalations SET lease_owner = ?, lease_token = ?, lease_expires = ?, attempts = attempts + 1, "
+                "first_leased_at = COALESCE(first_leased_at, ?) WHERE case_id = ? AND done = 0 AND lease_expires <= ?",
+                (agent_id, token, now + self.lease_seconds, now, case.case_id, now),
+            ).rowcount
+            if claimed:
+                return True
+            row = db.execute(
+                "SELECT lease_expires FROM escalations WHERE case_id = ? AND done = 0", (case.case_id,)
+            ).fetchone()
+        with self._cases_lock:
+            if row is None:
+                self._cases.pop(case.case_id, None)
+            else:
+                self._elsewhere[case.case_id] = row[0]
+        return False
+
+    def lease(self, agent_id: str, shard: Optional[int] = None) -> Optional[EscalationCase]:
+        """
+        Lease the most urgent case in any shard, preferring ``shard`` among equally urgent ones.
+
+        Args:
+            agent_id: Human agent taking the case
+            shard: Preferred shard, e.g. the agent's team
+
+        Returns:
+            The leased case, or None if every shard is empty
+        """
+        self._load_new()
+        self._requeue_expired()
+        start = shard if shard is not None else zlib.crc32(agent_id.encode("utf-8")) % self.num_shards
+        while True:
+            # Compare shard heads by priority only, visiting the preferred shard first
+            best = None
+            for offset in range(self.num_shards):
+                index = (start + offset) % self.num_shards
+                with self._locks[index]:
+                    if self._shards[index] and (best is None or self._shards[index][0][0] < best[0][0]):
+                        best = (self._shards[index][0], index)
+            if best is None:
+                return None
+            head, index = best
+            with self._locks[index]:
+                if not self._shards[index] or self._shards[index][0] != head:
+                    continue  # Taken by a concurrent lease
+                heapq.heappop(self._shards[index])
+            case_id = head[3]
+            with self._cases_lock:
+                case = self._cases.get(case_id)
+            if case is None:
+                continue
+
+            now = time.time()
+            token = uuid.uuid4().hex
+            if not self._claim(case, agent_id, token, now):
+                continue
+            with self._cases_lock:
+                case.lease_owner = agent_id
+                case.lease_token = token
+                case.lease_expires = now + self.lease_seconds
+                case.attempts += 1
+                if case.first_leased_at is None:
+                    case.first_leased_at = now
+                    self.first_action_latencies.append(now - case.enqueued_at)
+                self._leased[case_id] = case
+            return case
+
+    def _update_case(self, case_id: str, sql: str, params: Tuple[Any, ...]) -> bool:
+        """Run a conditional update on the shard holding ``case_id``; return whether a row matched."""
+        with self._cases_lock:
+            case = self._cases.get(case_id)
+        # A console process may act on a case it has never loaded, so try every shard
+        shards = [case.shard] if case is not None else range(self.num_shards)
+        for shard in shards:
+            with self._db_locks[shard], self._dbs[shard]:
+                if self._dbs[shard].execute(sql, params).rowcount:
+                    return True
+        return False
+
+    def ack(self, case_id: str, lease_token: str) -> bool:
+        """
+        Mark a leased case as handled.
+
+        The lease may have been taken in another process.
+
+        Returns:
+            False if the case was leased again since, or the token is wrong
+        """
+        acked = self._update_case(
+            case_id,
+            "UPDATE escalations SET done = 1, lease_token = NULL WHERE case_id = ? AND lease_token = ? AND done = 0",
+            (case_id, lease_token),
+        )
+        if not acked:
+            return False
+        with self._cases_lock:
+            self._leased.pop(case_id, None)
+            self._elsewhere.pop(case_id, None)
+            self._cases.pop(case_id, None)
+        return True
+
+    def release(self, case_id: str, lease_token: str) -> bool:
+        """Give a leased case back to the queue without handling it."""
+        released = self._update_case(
+            case_id,
+            "UPDATE escalations SET lease_owner = NULL, lease_token = NULL, lease_expires = 0 "
+            "WHERE case_id = ? AND lease_token = ? AND done = 0",
+            (case_id, lease_token),
+        )
+        if not released:
+            return False
+        with self._cases_lock:
+            leased_here = self._leased.pop(case_id, None) is not None
+            leased_elsewhere = self._elsewhere.pop(case_id, None) is not None
+            case = self._cases.get(case_id)
+            if case is not None:
+                case.lease_owner = case.lease_token = None
+        if case is not None and (leased_here or leased_elsewhere):
+            self._push(case)
+        return True
+
+    def depth(self) -> int:
+        """Return the number of cases waiting (not leased)."""
+        total = 0
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                total += len(shard)
+        return total
+
+    def open_cases(self) -> List[Dict[str, Any]]:
+        """Return every case not yet acknowledged, most urgent first."""
+        rows = []
+        for lock, db in zip(self._db_locks, self._dbs):
+            with lock:
+                rows.extend(db.execute(
+                    "SELECT case_id, priority, reason, enqueued_at, lease_owner, lease_expires, attempts "
+                    "FROM escalations WHERE done = 0"
+                ).fetchall())
+        rows.sort(key=lambda row: (row[1], row[3]))
+        now = time.time()
+        return [
+            {
+                "case_id": case_id,
+                "priority": priority,
+                "reason": reason,
+                "enqueued_at": enqueued_at,
+                "leased_by": lease_owner if lease_expires > now else None,
+                "attempts": attempts,
+            }
+            for case_id, priority, reason, enqueued_at, lease_owner, lease_expires, attempts in rows
+        ]
+
+    def close(self) -> None:
+        """Stop the bundle builders after finishing queued builds, then close the store."""
+        self._pool.shutdown(wait=True)
+        for lock, db in zip(self._db_locks, self._dbs):
+            with lock:
+                db.close()
+
+
+def main() -> None:
+    """Minimal console for human agents working the escalation queue."""
+    from config import ESCALATION_DB_PATH, ESCALATION_SHARDS, ESCALATION_LEASE_SECONDS, ESCALATION_THUMBNAIL_DIR
+
+    parser = argparse.ArgumentParser(description="Work the human escalation queue.")
+    parser.add_argument("--db", default=ESCALATION_DB_PATH, help="Escalation database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show open cases")
+    lease = commands.add_parser("lease", help="Lease the most urgent case and show its context")
+    lease.add_argument("agent_id")
+    lease.add_argument("--shard", type=int, help="Preferred shard")
+    for name in ("ack", "release"):
+        command = commands.add_parser(name, help=f"{name.capitalize()} a leased case")
+        command.add_argument("case_id")
+        command.add_argument("lease_token")
+    args = parser.parse_args()
+
+    queue = EscalationQueue(
+        args.db,
+        num_shards=ESCALATION_SHARDS,
+        lease_seconds=ESCALATION_LEASE_SECONDS,
+        bundle_workers=1,
+        thumbnail_dir=ESCALATION_THUMBNAIL_DIR,
+    )
+    try:
+        if args.command == "list":
+            for case in queue.open_cases():
+                leased = f"leased by {case['leased_by']}" if case["leased_by"] else "waiting"
+                print(f"{case['case_id']}  p{case['priority']}  {leased:<24}  {case['reason']}")
+        elif args.command == "lease":
+            case = queue.lease(args.agent_id, args.shard)
+            if case is None:
+                print("No cases waiting.")
+                return
+            bundle = case.bundle()
+            print(f"Case {case.case_id} (priority {case.priority}): {case.reason}")
+            print(f"Lease token: {case.lease_token} (expires in {queue.lease_seconds:.0f}s)")
+            print(bundle.transcript_summary)
+            print(f"Product: {bundle.product}  Extracted price: {bundle.extracted_price}  Vision verdict: {bundle.vision_verdict}")
+            for kind, path in bundle.thumbnails.items():
+                print(f"{kind}: {path}")
+        else:
+            handled = getattr(queue, args.command)(args.case_id, args.lease_token)
+            print("Done." if handled else "Lease not held (expired, re-leased or wrong token).")
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
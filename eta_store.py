@@ -0,0 +1,316 @@
+# eta_store.py
+"""In-memory order and rider index used to answer ETA questions."""
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+@dataclass
+class RiderPosition:
+    """Latest known position and smoothed speed of a rider."""
+    lat: float
+    lon: float
+    updated_at: float
+    speed_kmh: float
+
+
+@dataclass
+class Order:
+    """Order being delivered by a rider."""
+    rider_id: str
+    pickup: Tuple[float, float]
+    dropoff: Tuple[float, float]
+    picked_up: bool = False
+    leg_km: float = 0.0  # Pickup to dropoff distance, computed once
+    delivered: bool = False
+
+
+class OrderRiderStore:
+    """
+    Rider positions and active orders with a uniform spatial grid index.
+
+    Location updates are applied in batches under a single lock. ETA queries
+    by order id are two dictionary lookups and one distance computation;
+    nearby-rider queries only scan the grid cells covering the radius.
+    """
+
+    def __init__(
+        self,
+        cell_size_deg: float = 0.01,
+        default_speed_kmh: float = 20.0,
+        road_factor: float = 1.3,
+        speed_smoothing: float = 0.3,
+    ):
+        """
+        Initialize an empty store.
+
+        Args:
+            cell_size_deg: Grid cell edge in degrees (0.01 is roughly 1.1 km)
+            default_speed_kmh: Speed assumed until a rider has moved
+            road_factor: Multiplier from straight-line to road distance
+            speed_smoothing: Weight of the newest sample in the speed average
+        """
+        self.cell_size_deg = cell_size_deg
+        self.default_speed_kmh = default_speed_kmh
+        self.road_factor = road_factor
+        self.speed_smoothing = speed_smoothing
+
+        self._lock = threading.RLock()
+        self._riders: Dict[str, RiderPosition] = {}
+        self._rider_cells: Dict[str, Tuple[int, int]] = {}
+        self._grid: Dict[Tuple[int, int], Set[str]] = defaultdict(set)
+        self._orders: Dict[str, Order] = {}
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (int(math.floor(lat / self.cell_size_deg)), int(math.floor(lon / self.cell_size_deg)))
+
+    def add_order(
+        self,
+        order_id: str,
+        rider_id: str,
+        pickup: Tuple[float, float],
+        dropoff: Tuple[float, float],
+        picked_up: bool = False,
+    ) -> None:
+        """Register an order and the rider assigned to it."""
+        leg_km = haversine_km(*pickup, *dropoff)
+        with self._lock:
+            self._orders[order_id] = Order(rider_id, pickup, dropoff, picked_up, leg_km)
+
+    def get_order(self, order_id: str) -> Optional[Order]:
+        """Return a registered order, or None if unknown."""
+        with self._lock:
+            return self._orders.get(order_id)
+
+    def mark_picked_up(self, order_id: str) -> None:
+        """Record that the rider has collected the order."""
+        with self._lock:
+            self._orders[order_id].picked_up = True
+
+    def mark_delivered(self, order_id: str) -> None:
+        """Record that the order has reached the customer."""
+        with self._lock:
+            order = self._orders[order_id]
+            order.picked_up = order.delivered = True
+
+    def update_locations(self, updates: Iterable[Tuple[str, float, float, float]]) -> int:
+        """
+        Apply a batch of rider location updates.
+
+        Args:
+            updates: Iterable of (rider_id, lat, lon, timestamp) tuples
+
+        Returns:
+            Number of updates applied (stale timestamps are skipped)
+        """
+        applied = 0
+        alpha = self.speed_smoothing
+        with self._lock:
+            riders, cells, grid = self._riders, self._rider_cells, self._grid
+            for rider_id, lat, lon, ts in updates:
+                previous = riders.get(rider_id)
+                if previous is None:
+                    riders[rider_id] = RiderPosition(lat, lon, ts, self.default_speed_kmh)
+                else:
+                    elapsed = ts - previous.updated_at
+                    if elapsed <= 0:
+                        continue
+                    sample = haversine_km(previous.lat, previous.lon, lat, lon) / (elapsed / 3600)
+                    previous.speed_kmh = (1 - alpha) * previous.speed_kmh + alpha * sample
+                    previous.lat, previous.lon, previous.updated_at = lat, lon, ts
+
+                cell = self._cell(lat, lon)
+                old_cell = cells.get(rider_id)
+                if old_cell != cell:
+                    if old_cell is not None:
+                        grid[old_cell].discard(rider_id)
+                        if not grid[old_cell]:
+                            del grid[old_cell]
+                    grid[cell].add(rider_id)
+                    cells[rider_id] = cell
+                applied += 1
+        return applied
+
+    def rider_position(self, rider_id: str) -> Optional[RiderPosition]:
+        """Return the latest known position of a rider."""
+        with self._lock:
+            return self._riders.get(rider_id)
+
+    def eta_minutes(self, order_id: str) -> Optional[float]:
+        """
+        Estimate minutes until an order reaches the customer.
+
+        Args:
+            order_id: Order identifier
+
+        Returns:
+            Estimated minutes (0 once delivered), or None if the order or its
+            rider is unknown
+        """
+        with self._lock:
+            order = self._orders.get(order_id)
+            if order is None:
+                return None
+            if order.delivered:
+                return 0.0
+            rider = self._riders.get(order.rider_id)
+            if rider is None:
+                return None
+            # Copy everything the simulator may change before computing outside the lock
+            lat, lon, speed = rider.lat, rider.lon, rider.speed_kmh
+            picked_up, pickup, dropoff, leg_km = order.picked_up, order.pickup, order.dropoff, order.leg_km
+
+        if picked_up:
+            distance_km = haversine_km(lat, lon, *dropoff)
+        else:
+            distance_km = haversine_km(lat, lon, *pickup) + leg_km
+        # Riders stopped at a light should not produce an unbounded ETA
+        speed = max(speed, self.default_speed_kmh / 4)
+        return distance_km * self.road_factor / speed * 60
+
+    def riders_near(self, lat: float, lon: float, radius_km: float) -> List[Tuple[str, float]]:
+        """
+        Return riders within ``radius_km`` of a point, nearest first.
+
+        Args:
+            lat: Latitude of the point
+            lon: Longitude of the point
+            radius_km: Search radius in kilometres
+
+        Returns:
+            List of (rider_id, distance_km) tuples
+        """
+        lat_cells = int(math.ceil(radius_km / 111.0 / self.cell_size_deg))
+        lon_span = 111.0 * max(math.cos(math.radians(lat)), 1e-6)
+        lon_cells = int(math.ceil(radius_km / lon_span / self.cell_size_deg))
+        center_lat, center_lon = self._cell(lat, lon)
+
+        found = []
+        with self._lock:
+            for i in range(center_lat - lat_cells, center_lat + lat_cells + 1):
+                for j in range(center_lon - lon_cells, center_lon + lon_cells + 1):
+                    for rider_id in self._grid.get((i, j), ()):
+                        rider = self._riders[rider_id]
+                        distance = haversine_km(lat, lon, rider.lat, rider.lon)
+                        if distance <= radius_km:
+                            found.append((rider_id, distance))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._orders)
+
+
+class RiderSimulator:
+    """
+    Local stand-in for the rider location feed.
+
+    Seeds the store with synthetic orders around a city centre and moves each
+    rider towards its current target, pushing updates to the store in batches.
+    """
+
+    def __init__(
+        self,
+        store: OrderRiderStore,
+        num_riders: int = 200,
+        center: Tuple[float, float] = (12.9716, 77.5946),
+        spread_deg: float = 0.08,
+        speed_kmh: float = 22.0,
+        seed: int = 0,
+    ):
+        """
+        Initialize the simulator and seed one order per rider.
+
+        Args:
+            store: Store receiving the updates
+            num_riders: Number of simulated riders (and orders)
+            center: City centre as (lat, lon)
+            spread_deg: Half-width of the simulated area in degrees
+            speed_kmh: Mean rider speed
+            seed: Random seed
+        """
+        self.store = store
+        self.speed_kmh = speed_kmh
+        self._rng = random.Random(seed)
+        self._positions: Dict[str, List[float]] = {}
+        self._targets: Dict[str, Tuple[str, Tuple[float, float]]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        def point() -> Tuple[float, float]:
+            return (
+                center[0] + self._rng.uniform(-spread_deg, spread_deg),
+                center[1] + self._rng.uniform(-spread_deg, spread_deg),
+            )
+
+        now = time.time()
+        initial = []
+        for n in range(num_riders):
+            rider_id = f"RIDER-{n:04d}"
+            order_id = f"ORD-{n:04d}"
+            start, pickup, dropoff = point(), point(), point()
+            store.add_order(order_id, rider_id, pickup, dropoff)
+            self._positions[rider_id] = list(start)
+            self._targets[rider_id] = (order_id, pickup)
+            initial.append((rider_id, start[0], start[1], now))
+        store.update_locations(initial)
+
+    def step(self, dt: float, now: Optional[float] = None) -> int:
+        """
+        Advance every rider by ``dt`` seconds and push one batch of updates.
+
+        Returns:
+            Number of updates applied
+        """
+        now = time.time() if now is None else now
+        batch = []
+        for rider_id, position in self._positions.items():
+            order_id, target = self._targets[rider_id]
+            step_km = self.speed_kmh * self._rng.uniform(0.6, 1.4) * dt / 3600
+            remaining_km = haversine_km(position[0], position[1], *target)
+            if remaining_km <= step_km:
+                position[0], position[1] = target
+                order = self.store.get_order(order_id)
+                if order is not None and not order.picked_up:
+                    self.store.mark_picked_up(order_id)
+                    self._targets[rider_id] = (order_id, order.dropoff)
+                elif order is not None and not order.delivered:
+                    # The rider waits at the dropoff once the order is delivered
+                    self.store.mark_delivered(order_id)
+            else:
+                fraction = step_km / remaining_km
+                position[0] += (target[0] - position[0]) * fraction
+                position[1] += (target[1] - position[1]) * fraction
+            batch.append((rider_id, position[0], position[1], now))
+        return self.store.update_locations(batch)
+
+    def start(self, interval: float = 1.0) -> None:
+        """Feed updates from a background thread every ``interval`` seconds."""
+        def loop() -> None:
+            while not self._stop.wait(interval):
+                self.step(interval)
+
+        self._thread = threading.Thread(target=loop, name="rider-simulator", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background feed."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -43,6 +43,7 @@ def build_support_graph(
     expected_router_functions = {
         "refundable_or_not",
         "verified_or_not",
+        "amount_verified_or_not",
         "user_convo",
         "satisfied_or_not",
     }
@@ -80,7 +81,6 @@ def build_support_graph(
     builder.add_edge(START, "classifier")
     builder.add_edge("ETA tool", "Agent")
     builder.add_edge("Service complaint Tool", "Agent")
-    builder.add_edge("Bill Amount verification", "Refund Tool")
     builder.add_edge("Refund Tool", "check")
     
     # Add conditional edges
@@ -93,6 +93,8 @@ def build_support_graph(
         ],
     )
     
+    # user_convo may return several tools; they run concurrently in one step and
+    # their results are merged by the tool_results reducer before the next Agent turn
     builder.add_conditional_edges(
         "Agent",
         router_functions["user_convo"],
@@ -122,4 +124,13 @@ def build_support_graph(
         ],
     )
     
+    builder.add_conditional_edges(
+        "Bill Amount verification",
+        router_functions["amount_verified_or_not"],
+        [
+            "Refund Tool",
+            "Human in loop",
+        ],
+    )
+    
     return builder
\ No newline at end of file
@@ -1,10 +1,49 @@
 # main.py
 """Main application for the Food Delivery Support Agent."""
+import atexit
 import logging
-from typing import Dict, Any, Callable
+import os
+import shutil
+import tempfile
+from contextlib import nullcontext
+from typing import Dict, Any, Callable, Optional
 
+from admission import AdmissionController, AdmissionRejected
+from cassette import Cassette, MODES as CASSETTE_MODES, wrap_stores_with_cassette
+from config import (
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_PRIORITIES,
+    ADMISSION_RESERVED,
+    ADMISSION_QUEUE_LIMITS,
+    ADMISSION_DEGRADE_THRESHOLD,
+    ADMISSION_QUEUE_TIMEOUT,
+    ETA_GRID_CELL_DEG,
+    ETA_SIMULATOR_ENABLED,
+    ETA_SIMULATOR_RIDERS,
+    ETA_SIMULATOR_INTERVAL,
+    COMPLAINT_DB_PATH,
+    COMPLAINT_BUFFER_SIZE,
+    COMPLAINT_BATCH_SIZE,
+    COMPLAINT_FLUSH_INTERVAL,
+    COMPLAINT_FSYNC,
+    REFUND_LEDGER_PATH,
+    REFUND_FSYNC,
+    REFUND_MAX_BATCH_DELAY,
+    ESCALATION_DB_PATH,
+    ESCALATION_SHARDS,
+    ESCALATION_LEASE_SECONDS,
+    ESCALATION_BUNDLE_WORKERS,
+    ESCALATION_THUMBNAIL_DIR,
+    CASSETTE_MODE,
+    CASSETTE_PATH,
+    CASSETTE_LATENCY_SCALE,
+)
+from escalation import EscalationQueue
+from complaint_log import ComplaintSink
+from refund_ledger import RefundLedger
+from eta_store import OrderRiderStore, RiderSimulator
 from schemas import SomeState, create_initial_state
-from models import setup_llm_models, setup_vision_models 
+from models import setup_llm_models, setup_vision_models, wrap_models_with_cassette
 from nodes import NodeFunctions
 from conditionals import ConditionalRouters
 from graph import build_support_graph
@@ -16,29 +55,175 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def setup_models() -> Dict[str, Any]:
-    """Set up and return all required models."""
-    logger.info("Setting up language models...")
-    llm_models = setup_llm_models()
+def setup_models(cassette: Optional[Cassette] = None) -> Dict[str, Any]:
+    """Set up and return all required models, recorded or replayed through ``cassette`` if given."""
+    if cassette is not None and cassette.replaying:
+        # Every LLM response comes from the cassette, so no client (or API key) is needed
+        llm_models = {"classifier_llm": None, "agent_conversation_llm": None, "agent_conversation_chain": None}
+    else:
+        logger.info("Setting up language models...")
+        llm_models = setup_llm_models()
     
     logger.info("Setting up vision models...")
-    vision_models = setup_vision_models()
+    # Replay serves vision responses from the cassette, so the model itself is not loaded
+    vision_models, _ = setup_vision_models(load_model=cassette is None or not cassette.replaying)
     
     # Combine all models into one dictionary
-    return {**llm_models, **vision_models}
+    models = {**llm_models, **vision_models}
+    if cassette is not None:
+        logger.info(f"Model I/O {cassette.mode} via cassette {cassette.path}")
+        models = wrap_models_with_cassette(models, cassette)
+    return models
+
+def setup_cassette() -> Optional[Cassette]:
+    """Open the cassette selected by ``CASSETTE_MODE``, saving recordings at exit."""
+    if CASSETTE_MODE not in CASSETTE_MODES:
+        raise ValueError(f"CASSETTE_MODE must be one of {CASSETTE_MODES}")
+    if CASSETTE_MODE == "off":
+        return None
+    cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY_SCALE)
+    atexit.register(cassette.save)
+    return cassette
+
+def setup_admission() -> AdmissionController:
+    """Create the admission controller shared by all nodes and routers."""
+    return AdmissionController(
+        max_concurrent=ADMISSION_MAX_CONCURRENT,
+        priorities=ADMISSION_PRIORITIES,
+        queue_limits=ADMISSION_QUEUE_LIMITS,
+        reserved=ADMISSION_RESERVED,
+        degrade_threshold=ADMISSION_DEGRADE_THRESHOLD,
+        queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    )
+
+def setup_eta_store() -> OrderRiderStore:
+    """Create the ETA store and, if enabled, start the local rider feed."""
+    store = OrderRiderStore(cell_size_deg=ETA_GRID_CELL_DEG)
+    if ETA_SIMULATOR_ENABLED:
+        logger.info(f"Starting rider simulator with {ETA_SIMULATOR_RIDERS} riders...")
+        RiderSimulator(store, num_riders=ETA_SIMULATOR_RIDERS).start(ETA_SIMULATOR_INTERVAL)
+    return store
+
+def setup_complaint_sink() -> ComplaintSink:
+    """Open the write-behind complaint log, committing any buffered complaints at exit."""
+    sink = ComplaintSink(
+        COMPLAINT_DB_PATH,
+        buffer_size=COMPLAINT_BUFFER_SIZE,
+        batch_size=COMPLAINT_BATCH_SIZE,
+        flush_interval=COMPLAINT_FLUSH_INTERVAL,
+        fsync=COMPLAINT_FSYNC,
+    )
+    atexit.register(sink.close)
+    return sink
+
+def setup_refund_ledger() -> RefundLedger:
+    """Open the refund ledger, rebuilding its indexes from the log."""
+    ledger = RefundLedger(REFUND_LEDGER_PATH, fsync=REFUND_FSYNC, max_batch_delay=REFUND_MAX_BATCH_DELAY)
+    logger.info(f"Refund ledger replayed {ledger.replayed} entries")
+    atexit.register(ledger.close)
+    return ledger
+
+def setup_escalation_queue() -> EscalationQueue:
+    """Create the human escalation queue, finishing pending bundle builds at exit."""
+    escalation_queue = EscalationQueue(
+        ESCALATION_DB_PATH,
+        num_shards=ESCALATION_SHARDS,
+        lease_seconds=ESCALATION_LEASE_SECONDS,
+        bundle_workers=ESCALATION_BUNDLE_WORKERS,
+        thumbnail_dir=ESCALATION_THUMBNAIL_DIR,
+    )
+    atexit.register(escalation_queue.close)
+    return escalation_queue
+
+def setup_stores() -> Dict[str, Any]:
+    """Open the configured stores the tool nodes use, closed at exit."""
+    return {
+        "eta_store": setup_eta_store(),
+        "complaint_sink": setup_complaint_sink(),
+        "refund_ledger": setup_refund_ledger(),
+        "escalation_queue": setup_escalation_queue(),
+    }
+
+def setup_replay_stores() -> Dict[str, Any]:
+    """
+    Open throwaway stores for one replayed session; release them with ``close_replay_stores``.
+    
+    Ledger, complaint log and escalation queue live in a fresh temporary
+    directory, so a replay never touches real data. ETA lookups and refund
+    outcomes are served from the cassette (see ``wrap_stores_with_cassette``),
+    so the ETA store is left empty and no simulator runs.
+    """
+    tmp_dir = tempfile.mkdtemp(prefix="replay-")
+    return {
+        "eta_store": OrderRiderStore(cell_size_deg=ETA_GRID_CELL_DEG),
+        "complaint_sink": ComplaintSink(
+            os.path.join(tmp_dir, "complaints.db"),
+            buffer_size=COMPLAINT_BUFFER_SIZE,
+            batch_size=COMPLAINT_BATCH_SIZE,
+            flush_interval=COMPLAINT_FLUSH_INTERVAL,
+            fsync=COMPLAINT_FSYNC,
+        ),
+        "refund_ledger": RefundLedger(
+            os.path.join(tmp_dir, "refund_ledger.log"),
+            fsync=REFUND_FSYNC,
+            max_batch_delay=REFUND_MAX_BATCH_DELAY,
+        ),
+        "escalation_queue": EscalationQueue(
+            os.path.join(tmp_dir, "escalations.db"),
+            num_shards=ESCALATION_SHARDS,
+            lease_seconds=ESCALATION_LEASE_SECONDS,
+            bundle_workers=ESCALATION_BUNDLE_WORKERS,
+            thumbnail_dir=os.path.join(tmp_dir, "thumbnails"),
+        ),
+        "tmp_dir": tmp_dir,
+    }
 
-def create_support_agent():
-    """Create and return the compiled support agent."""
+def close_replay_stores(stores: Dict[str, Any]) -> None:
+    """Close stores from ``setup_replay_stores`` and delete their directory."""
+    stores["complaint_sink"].close()
+    stores["refund_ledger"].close()
+    stores["escalation_queue"].close()
+    shutil.rmtree(stores["tmp_dir"], ignore_errors=True)
+
+def create_support_agent(
+    admission: AdmissionController = None,
+    cassette: Optional[Cassette] = None,
+    stores: Optional[Dict[str, Any]] = None,
+):
+    """
+    Create and return the compiled support agent.
+    
+    Args:
+        admission: Admission controller, a new one from config if not given
+        cassette: Optional cassette recording or replaying model I/O and store lookups
+        stores: Stores for the tool nodes (see ``setup_stores``), the configured ones if not given
+    """
     # Set up models
-    models = setup_models()
+    models = setup_models(cassette)
+
+    if stores is None:
+        stores = setup_stores()
+    if cassette is not None:
+        stores = wrap_stores_with_cassette(stores, cassette)
+
+    # Set up admission control
+    if admission is None:
+        admission = setup_admission()
     
     # Create node function implementations
     logger.info("Creating node functions...")
-    node_funcs = NodeFunctions(models)
+    node_funcs = NodeFunctions(
+        models,
+        admission=admission,
+        eta_store=stores["eta_store"],
+        complaint_sink=stores["complaint_sink"],
+        refund_ledger=stores["refund_ledger"],
+        escalation_queue=stores["escalation_queue"],
+    )
     
     # Create router function implementations
     logger.info("Creating router functions...")
-    router_funcs = ConditionalRouters(models)
+    router_funcs = ConditionalRouters(models, admission=admission)
     
     # Create node function dictionary
     node_functions = {
@@ -57,6 +242,7 @@ def create_support_agent():
     router_functions = {
         "refundable_or_not": router_funcs.refundable_or_not,
         "verified_or_not": router_funcs.verified_or_not,
+        "amount_verified_or_not": router_funcs.amount_verified_or_not,
         "user_convo": router_funcs.user_convo,
         "satisfied_or_not": router_funcs.satisfied_or_not,
     }
@@ -73,45 +259,57 @@ def create_support_agent():
     logger.info("Compiling support agent graph...")
     return agent_graph.compile()
 
-def run_support_flow():
+def run_support_flow(cassette: Optional[Cassette] = None):
     """
     Run the food delivery support agent workflow.
+    
+    Args:
+        cassette: Optional cassette recording or replaying model I/O and user input
     """
     logger.info("Starting Food Delivery Support Agent Demo")
     print("\nWelcome to the Food Delivery Support Agent Demo!")
     print("-------------------------------------------------")
 
-    # Get initial user message
-    user_message = input("\nPlease describe your issue or complaint: ")
-    
-    # Create initial state
-    state = create_initial_state(user_message)
-    
-    try:
-        # Create and compile the agent
-        compiled_agent = create_support_agent()
+    with cassette.user_input() if cassette is not None else nullcontext():
+        # Get initial user message
+        user_message = input("\nPlease describe your issue or complaint: ")
         
-        # Invoke the workflow
-        logger.info("Invoking agent workflow")
-        final_state = compiled_agent.invoke(state)
-
-        # Display results
-        print("\n---- Conversation/Notes ----")
-        print(final_state["notes"])
-        print("----------------------------")
-
-        logger.info("Workflow completed")
-        print("Workflow completed. Final state summary:")
-        print(f"- Issue type: {final_state['classification']}")
-        print(f"- Resolved: {final_state['resolved']}")
-        if final_state.get('refund_amount'):
-            print(f"- Refund processed: {final_state['refund_amount']} for {final_state['refund_prdct']}")
+        # Create initial state
+        state = create_initial_state(user_message)
+        
+        try:
+            # Create and compile the agent
+            # Recording runs against the real stores; replay must not touch them
+            stores = None
+            if cassette is not None and cassette.replaying:
+                stores = setup_replay_stores()
+                atexit.register(close_replay_stores, stores)
+            compiled_agent = create_support_agent(cassette=cassette, stores=stores)
             
-    except Exception as e:
-        logger.error(f"Error during workflow execution: {e}", exc_info=True)
-        print(f"An error occurred: {e}")
+            # Invoke the workflow
+            logger.info("Invoking agent workflow")
+            final_state = compiled_agent.invoke(state)
+
+            # Display results
+            print("\n---- Conversation/Notes ----")
+            print(final_state["notes"])
+            print("----------------------------")
+
+            logger.info("Workflow completed")
+            print("Workflow completed. Final state summary:")
+            print(f"- Issue type: {final_state['classification']}")
+            print(f"- Resolved: {final_state['resolved']}")
+            if final_state.get('refund_amount'):
+                print(f"- Refund processed: {final_state['refund_amount']} for {final_state['refund_prdct']}")
+                
+        except AdmissionRejected as e:
+            logger.warning(f"Request shed by admission control: {e}")
+            print("We're experiencing very high demand right now. Please try again in a few minutes.")
+        except Exception as e:
+            logger.error(f"Error during workflow execution: {e}", exc_info=True)
+            print(f"An error occurred: {e}")
         
     print("Thank you for using our Food Delivery Support Agent!\n")
 
 if __name__ == "__main__":
-    run_support_flow()
\ No newline at end of file
+    run_support_flow(setup_cassette())
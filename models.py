@@ -1,11 +1,17 @@
 # models.py
 """Setup for language and vision models."""
+import hashlib
+import json
+import logging
 import os
-from typing import Callable, Any, Optional, Type
+import time
+from typing import Callable, Any, Dict, Optional, Type
 from typing_extensions import TypedDict
 
 # ============== LangChain Imports ==============
 from langchain.chat_models import ChatOpenAI
+from langchain_community.chat_models.huggingface import ChatHuggingFace
+from langchain_community.llms.huggingface_pipeline import HuggingFacePipeline
 from langchain.llms import OpenAI
 from langchain.chains import ConversationChain
 from langchain.memory import ConversationBufferMemory
@@ -22,21 +28,86 @@ import requests
 from optimum.intel.openvino import OVModelForVisualCausalLM
 from transformers import AutoProcessor, TextStreamer
 
-from config import OPENAI_API_KEY, CLASSIFIER_MODEL, AGENT_MODEL, VISION_MODEL, AGENT_SYSTEM_PROMPT
+import openvino as ov
 
-def setup_llm_models():
-    """Initialize and return the language models used in the application."""
+from cassette import Cassette, CassetteChain, CassetteChatModel, CassetteVisionModel
+from config import (
+    OPENAI_API_KEY,
+    CLASSIFIER_BACKEND,
+    AGENT_BACKEND,
+    CLASSIFIER_MODEL,
+    AGENT_MODEL,
+    LOCAL_CLASSIFIER_MODEL,
+    LOCAL_AGENT_MODEL,
+    LOCAL_LLM_DEVICE,
+    LOCAL_LLM_MAX_NEW_TOKENS,
+    VISION_MODEL,
+    VISION_DEVICE,
+    VISION_OV_CONFIG,
+    VISION_CACHE_DIR,
+    AGENT_SYSTEM_PROMPT,
+)
+
+logger = logging.getLogger(__name__)
+
+LLM_BACKENDS = ("openai", "openvino")
+
+# Local models are shared between roles that use the same model id
+_local_chat_models: Dict[str, Any] = {}
+
+def _local_chat_model(model_id: str):
+    """Load (once) a local OpenVINO text-generation model wrapped as a chat model."""
+    if model_id not in _local_chat_models:
+        start = time.perf_counter()
+        llm = HuggingFacePipeline.from_model_id(
+            model_id=model_id,
+            task="text-generation",
+            backend="openvino",
+            model_kwargs={
+                "device": LOCAL_LLM_DEVICE,
+                "ov_config": {"CACHE_DIR": compiled_model_cache_path(model_id, LOCAL_LLM_DEVICE, {})},
+            },
+            # Greedy decoding keeps short classification/routing answers stable, and
+            # return_full_text=False returns only the reply instead of prompt + reply
+            pipeline_kwargs={"max_new_tokens": LOCAL_LLM_MAX_NEW_TOKENS, "do_sample": False, "return_full_text": False},
+        )
+        _local_chat_models[model_id] = ChatHuggingFace(llm=llm)
+        logger.info(f"Local LLM {model_id} ready in {time.perf_counter() - start:.1f}s")
+    return _local_chat_models[model_id]
+
+def create_chat_model(backend: str, remote_model: str, local_model: str):
+    """
+    Return a chat model for one role on the selected backend.
+    
+    Args:
+        backend: "openai" or "openvino"
+        remote_model: OpenAI model name used with the "openai" backend
+        local_model: OpenVINO model id used with the "openvino" backend
+    """
+    if backend == "openai":
+        if not OPENAI_API_KEY:
+            raise ValueError("Missing OpenAI API Key!")
+        return ChatOpenAI(
+            model_name=remote_model,
+            temperature=0.7,
+        )
+    if backend == "openvino":
+        return _local_chat_model(local_model)
+    raise ValueError(f"Unknown LLM backend {backend!r}, expected one of {LLM_BACKENDS}")
+
+def setup_llm_models(classifier_backend: str = CLASSIFIER_BACKEND, agent_backend: str = AGENT_BACKEND):
+    """
+    Initialize and return the language models used in the application.
+    
+    Args:
+        classifier_backend: Backend for complaint classification
+        agent_backend: Backend for routing and agent replies
+    """
     # Classifier model for determining if a complaint is refundable
-    classifier_llm = ChatOpenAI(
-        model_name=CLASSIFIER_MODEL,
-        temperature=0.7,
-    )
+    classifier_llm = create_chat_model(classifier_backend, CLASSIFIER_MODEL, LOCAL_CLASSIFIER_MODEL)
     
     # Agent conversation model
-    agent_conversation_llm = ChatOpenAI(
-        model_name=AGENT_MODEL,
-        temperature=0.7,
-    )
+    agent_conversation_llm = create_chat_model(agent_backend, AGENT_MODEL, LOCAL_AGENT_MODEL)
     
     system_message = SystemMessage(content=AGENT_SYSTEM_PROMPT)
     
@@ -59,12 +130,73 @@ def setup_llm_models():
         "agent_conversation_chain": agent_conversation_chain
     }
 
-def setup_vision_models():
-    """Initialize and return the vision models used in the application."""
+def compiled_model_cache_path(
+    model_id: str,
+    device: str,
+    ov_config: Dict[str, Any],
+    cache_dir: str = VISION_CACHE_DIR,
+) -> str:
+    """
+    Return the compiled-model cache directory for a model, OpenVINO version and device config.
+    
+    Any change to one of these yields a new directory, so stale blobs are never reused.
+    """
+    key = json.dumps([model_id, ov.get_version(), device, ov_config], sort_keys=True)
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{model_id.replace('/', '--')}-{digest}")
+
+def vision_cache_path(cache_dir: str = VISION_CACHE_DIR) -> str:
+    """Return the compiled-model cache directory of the configured vision model."""
+    return compiled_model_cache_path(VISION_MODEL, VISION_DEVICE, VISION_OV_CONFIG, cache_dir)
+
+def _enable_weight_mmap():
+    """Ask the OpenVINO core used by optimum to memory-map IR weights instead of copying them."""
+    try:
+        from optimum.intel.openvino.modeling_base import core
+        core.set_property({"ENABLE_MMAP": True})
+    except (ImportError, AttributeError, RuntimeError) as e:
+        logger.warning(f"Could not enable weight memory-mapping: {e}")
+
+def setup_vision_models(cache_dir: str = VISION_CACHE_DIR, load_model: bool = True):
+    """
+    Initialize and return the vision models used in the application.
+    
+    Compiled blobs are cached under ``cache_dir`` so a warm restart skips
+    compilation, and weights are memory-mapped so workers on one host share pages.
+    With ``load_model`` False only the processor is loaded (for cassette replay).
+    
+    Returns:
+        Tuple of the models dictionary and load timings
+        (``ready_seconds``, and ``cache_warm`` for whether compiled blobs were reused)
+    """
+    start = time.perf_counter()
+    if not load_model:
+        processor = AutoProcessor.from_pretrained(VISION_MODEL, trust_remote_code=True)
+        return {"processor": processor, "ov_model": None}, {"ready_seconds": time.perf_counter() - start, "cache_warm": False}
+
+    cache_path = vision_cache_path(cache_dir)
+    warm = os.path.isdir(cache_path) and any(name.endswith(".blob") for name in os.listdir(cache_path))
+    os.makedirs(cache_path, exist_ok=True)
+    _enable_weight_mmap()
+
     processor = AutoProcessor.from_pretrained(VISION_MODEL, trust_remote_code=True)
-    ov_model = OVModelForVisualCausalLM.from_pretrained(VISION_MODEL, trust_remote_code=True)
+    ov_model = OVModelForVisualCausalLM.from_pretrained(
+        VISION_MODEL,
+        trust_remote_code=True,
+        device=VISION_DEVICE,
+        ov_config={**VISION_OV_CONFIG, "CACHE_DIR": cache_path},
+    )
+
+    ready_seconds = time.perf_counter() - start
+    logger.info(f"Vision model ready in {ready_seconds:.1f}s ({'warm' if warm else 'cold'} compile cache at {cache_path})")
     
-    return {
-        "processor": processor,
-        "ov_model": ov_model
-    }
\ No newline at end of file
+    return {"processor": processor, "ov_model": ov_model}, {"ready_seconds": ready_seconds, "cache_warm": warm}
+
+def wrap_models_with_cassette(models: Dict[str, Any], cassette: Cassette) -> Dict[str, Any]:
+    """Route every model call the nodes and routers make through ``cassette``."""
+    wrapped = dict(models)
+    wrapped["classifier_llm"] = CassetteChatModel(models["classifier_llm"], cassette, "classifier_llm")
+    wrapped["agent_conversation_llm"] = CassetteChatModel(models["agent_conversation_llm"], cassette, "agent_conversation_llm")
+    wrapped["agent_conversation_chain"] = CassetteChain(models["agent_conversation_chain"], cassette, "agent_conversation_chain")
+    wrapped["ov_model"] = CassetteVisionModel(models["ov_model"], cassette, "ov_model")
+    return wrapped
@@ -1,26 +1,130 @@
 # nodes.py
 """Implementation of workflow nodes for the support agent."""
+import re
+import threading
+from contextlib import nullcontext
 from PIL import Image
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from transformers import TextStreamer
 
+from admission import AdmissionController, AdmissionRejected
+from complaint_log import ComplaintSink
+from escalation import EscalationQueue, PRIORITY_REFUND, PRIORITY_UNRESOLVED
+from eta_store import OrderRiderStore
+from refund_ledger import RefundLedger, hash_image
 from schemas import SomeState
 
+def problem_verify_prompt(complaint: str) -> str:
+    """Build the vision prompt checking an image against the customer complaint."""
+    return f"<|image_1|>\n does this image match with the customer complaint : {complaint}, Reply with only YES or NO"
+
+def bill_amount_prompt(product: str) -> str:
+    """Build the vision prompt reading a product's price off a bill image."""
+    return f"<|image_1|>\n what is the price of the following item {product} reply with only the numeric value no currency"
+
+REFUND_KEYWORDS = (
+    "refund", "money back", "damaged", "broken", "torn", "spilled", "leaking", "cold",
+    "melted", "missing", "never arrived", "never came", "not delivered", "wrong item",
+)
+
+def heuristic_classification(user_message: str) -> str:
+    """
+    Cheap keyword-based stand-in for the LLM classifier used under load.
+    
+    Args:
+        user_message: The user's complaint
+        
+    Returns:
+        "refundable" or "non_refundable"
+    """
+    message = user_message.lower()
+    if any(re.search(rf"\b{re.escape(keyword)}\b", message) for keyword in REFUND_KEYWORDS):
+        return "refundable"
+    return "non_refundable"
+
+def parse_classification(classification_raw: str) -> str:
+    """
+    Parse the classifier LLM's answer.
+    
+    "non_refundable" contains "refundable", so negated answers are checked
+    first and anything that is not plainly "refundable" stays non-refundable.
+    
+    Args:
+        classification_raw: The classifier's reply
+        
+    Returns:
+        "refundable" or "non_refundable"
+    """
+    answer = classification_raw.lower()
+    if re.search(r"\b(?:non|not)[\s_-]*refundable\b", answer):
+        return "non_refundable"
+    if re.search(r"\brefundable\b", answer):
+        return "refundable"
+    return "non_refundable"
+
 class NodeFunctions:
     """Collection of node functions used in the workflow graph."""
     
-    def __init__(self, models: Dict[str, Any]):
+    def __init__(
+        self,
+        models: Dict[str, Any],
+        admission: Optional[AdmissionController] = None,
+        eta_store: Optional[OrderRiderStore] = None,
+        complaint_sink: Optional[ComplaintSink] = None,
+        refund_ledger: Optional[RefundLedger] = None,
+        escalation_queue: Optional[EscalationQueue] = None,
+    ):
         """
         Initialize with required models.
         
         Args:
             models: Dictionary containing all required models
+            admission: Optional admission controller guarding expensive calls
+            eta_store: Order and rider index used to answer ETA questions
+            complaint_sink: Buffered store that service complaints are logged to
+            refund_ledger: Idempotent ledger that refunds are recorded in
+            escalation_queue: Work queue that escalated sessions are handed to
         """
         self.classifier_llm = models.get("classifier_llm")
         self.agent_conversation_llm = models.get("agent_conversation_llm")
         self.agent_conversation_chain = models.get("agent_conversation_chain")
         self.ov_model = models.get("ov_model")
         self.processor = models.get("processor")
+        self.admission = admission
+        self.eta_store = eta_store
+        self.complaint_sink = complaint_sink
+        self.refund_ledger = refund_ledger
+        self.escalation_queue = escalation_queue
+        self._order_ids: Dict[str, str] = {}
+        self._order_id_lock = threading.Lock()
+
+    def _admit(self, route: str):
+        """Return an admission context for ``route``, or a no-op without a controller."""
+        return self.admission.admit(route) if self.admission is not None else nullcontext()
+
+    def _order_id(self, state: SomeState) -> str:
+        """Return the session's order id, asking the user once even if several tools need it at the same time."""
+        if state.get("order_id"):
+            return state["order_id"]
+        with self._order_id_lock:
+            if state["session_id"] not in self._order_ids:
+                self._order_ids[state["session_id"]] = input("Please enter your order id: ").strip().upper()
+            return self._order_ids[state["session_id"]]
+
+    def _forget_order_id(self, state: SomeState) -> None:
+        """Drop the shared answer once the order id has reached the state."""
+        with self._order_id_lock:
+            self._order_ids.pop(state["session_id"], None)
+
+    def _vision_degraded(self) -> bool:
+        """Whether vision checks should be handed to a human instead of run now."""
+        return self.admission is not None and self.admission.degraded("refund")
+
+    def _defer_review(self, state: SomeState, check: str) -> None:
+        """Leave a vision check for the human escalation queue instead of running it now."""
+        print(f"System busy: {check} will be reviewed by a support agent.")
+        state["review_reason"] = f"{check} deferred to human review (system under load)"
+        state["notes"] += f"\n[{check}] Vision check deferred to human review (system under load)."
     
     def classifier(self, state: SomeState) -> dict:
         """
@@ -61,12 +165,21 @@ class NodeFunctions:
                 """
 
 
+        # Fall back to keywords rather than shedding the whole conversation under load
+        if self.admission is not None and self.admission.degraded("conversation"):
+            state["classification"] = heuristic_classification(user_message)
+            print(f"classifier degraded heuristic => {state['classification']}")
+            return state
+
         # Uncomment to use actual classification
-        classification_raw = self.classifier_llm.invoke(prompt).content
-        if "refundable" in classification_raw.lower():
-            state["classification"] = "refundable"
-        else:
-            state["classification"] = "non_refundable"
+        try:
+            with self._admit("conversation"):
+                classification_raw = self.classifier_llm.invoke(prompt).content
+        except AdmissionRejected as e:
+            state["classification"] = heuristic_classification(user_message)
+            print(f"{e}; classifier heuristic => {state['classification']}")
+            return state
+        state["classification"] = parse_classification(classification_raw)
         
         # For testing/simulation purposes
         # state["classification"] = "refundable"
@@ -85,6 +198,9 @@ class NodeFunctions:
         """
         print("\n[Node: problem_verify]")
 
+        # The order id keys the refund ledger's duplicate check
+        state["order_id"] = self._order_id(state)
+        self._forget_order_id(state)
         prdct_name = input("Please enter your item name: ")
         state["refund_prdct"] = prdct_name
         problem_image_path = input("Please enter your image proof: ").strip()
@@ -95,32 +211,38 @@ class NodeFunctions:
         state["image_bill_path"] = bill_image_path
         print("Thanks Please wait while we process your request")
 
+        if self._vision_degraded():
+            self._defer_review(state, "problem_verify")
+            state["verified"] = False
+            return state
+
         # Process the image with vision model
-        prompt = f"<|image_1|>\n does this image match with the customer complaint : {state['user_first_message']}, Reply with only YES or NO"
+        prompt = problem_verify_prompt(state['user_first_message'])
         print(prompt)
         try:
             url = state["image_problem_path"]
             image = Image.open(url)
             image.show()
 
-            inputs = self.ov_model.preprocess_inputs(
-                text=prompt, 
-                image=image, 
-                processor=self.processor
-            )
+            with self._admit("refund"):
+                inputs = self.ov_model.preprocess_inputs(
+                    text=prompt, 
+                    image=image, 
+                    processor=self.processor
+                )
 
-            generation_args = {
-                "max_new_tokens": 50,
-                "temperature": 0.0,
-                "do_sample": False,
-                "streamer": TextStreamer(self.processor.tokenizer, skip_prompt=True, skip_special_tokens=True)
-            }
-
-            generate_ids = self.ov_model.generate(
-                **inputs,
-                eos_token_id=self.processor.tokenizer.eos_token_id,
-                **generation_args
-            )
+                generation_args = {
+                    "max_new_tokens": 50,
+                    "temperature": 0.0,
+                    "do_sample": False,
+                    "streamer": TextStreamer(self.processor.tokenizer, skip_prompt=True, skip_special_tokens=True)
+                }
+
+                generate_ids = self.ov_model.generate(
+                    **inputs,
+                    eos_token_id=self.processor.tokenizer.eos_token_id,
+                    **generation_args
+                )
 
             generate_ids = generate_ids[:, inputs['input_ids'].shape[1]:]
             response = self.processor.batch_decode(
@@ -131,6 +253,9 @@ class NodeFunctions:
             
             print(f"LLM verification result => {response}")
             state["verified"] = response.lower() != "no"
+        except AdmissionRejected:
+            self._defer_review(state, "problem_verify")
+            state["verified"] = False
         except Exception as e:
             print(f"Error in problem verification: {e}")
             state["verified"] = False
@@ -151,9 +276,24 @@ class NodeFunctions:
         print("\n[Node: Agent]")
         user_message = state.get("user_message", "")
 
+        # Merge results of the tools that just ran (possibly in parallel) into one reply
+        tool_results = {name: result for name, result in state.get("tool_results", {}).items() if result}
+        agent_input = user_message
+        if tool_results:
+            # The tools of this step are done, so their order id is in the state now
+            self._forget_order_id(state)
+            for result in tool_results.values():
+                state["notes"] += f"\n{result}"
+            agent_input = f"{user_message}\n\nTool results:\n" + "\n".join(tool_results.values())
+            state["tool_results"] = {name: None for name in tool_results}
+
         # Process the current message if there is one
         if user_message:
-            response = self.agent_conversation_chain.run(user_message)
+            try:
+                with self._admit("conversation"):
+                    response = self.agent_conversation_chain.run(agent_input)
+            except AdmissionRejected:
+                response = "We're handling a high volume of requests right now. Could you tell me briefly what you need help with?"
             print(f"Agent says: {response}")
             state["notes"] += f"\n[Agent conversation] User: {user_message}\nAgent: {response}"
 
@@ -172,16 +312,34 @@ class NodeFunctions:
         """
         Provide estimated delivery time information.
         
+        Runs alongside other tools when a message carries several intents, so
+        it returns only its own keys instead of the whole state.
+        
         Args:
             state: Current workflow state
             
         Returns:
-            Updated state with ETA information
+            Partial state update with the ETA tool result
         """
         print("\n[Node: ETA_tool]")
-        print("Simulated: The order will arrive in ~30 minutes.")
-        state["notes"] += "\n[ETA_tool] Provided an ETA of ~30 minutes (simulated)."
-        return state
+        if self.eta_store is None:
+            print("Simulated: The order will arrive in ~30 minutes.")
+            return {"tool_results": {"ETA tool": "[ETA_tool] Provided an ETA of ~30 minutes (simulated)."}}
+
+        order_id = self._order_id(state)
+        order = self.eta_store.get_order(order_id)
+        eta = self.eta_store.eta_minutes(order_id)
+        if order is not None and order.delivered:
+            print(f"Your order {order_id} has been delivered.")
+            result = f"[ETA_tool] Order {order_id} has already been delivered."
+        elif eta is None:
+            print(f"We couldn't find an active delivery for order {order_id}.")
+            result = f"[ETA_tool] No active delivery found for order {order_id}."
+        else:
+            minutes = max(1, round(eta))
+            print(f"Your order {order_id} will arrive in about {minutes} minutes.")
+            result = f"[ETA_tool] Provided an ETA of ~{minutes} minutes for order {order_id}."
+        return {"tool_results": {"ETA tool": result}, "order_id": order_id}
 
     def check_resolution(self, state: SomeState) -> dict:
         """
@@ -210,24 +368,56 @@ class NodeFunctions:
             Updated state with escalation notes
         """
         print("\n[Node: human_in_the_loop]")
-        print("Simulated: Escalating to a human support agent. (End of automation)")
-        state["notes"] += "\n[human_in_the_loop] Issue escalated to a human agent."
+        if self.escalation_queue is None:
+            print("Simulated: Escalating to a human support agent. (End of automation)")
+            state["notes"] += "\n[human_in_the_loop] Issue escalated to a human agent."
+            return state
+
+        if state.get("review_reason"):
+            reason, priority = state["review_reason"], PRIORITY_REFUND
+        elif state["classification"] == "refundable" and not state["verified"]:
+            reason, priority = "Refund claim could not be verified automatically", PRIORITY_REFUND
+        else:
+            reason, priority = "Customer reported the issue as unresolved", PRIORITY_UNRESOLVED
+        state["notes"] += f"\n[human_in_the_loop] Issue escalated to a human agent: {reason}."
+        case = self.escalation_queue.enqueue(state, reason, priority)
+        print(f"Escalating to a human support agent, your case id is {case.case_id}. (End of automation)")
         return state
 
     def service_complaint(self, state: SomeState) -> dict:
         """
         Handle service-related complaints.
         
+        Runs alongside other tools when a message carries several intents, so
+        it returns only its own keys instead of the whole state.
+        
         Args:
             state: Current workflow state
             
         Returns:
-            Updated state with complaint notes
+            Partial state update with the complaint tool result
         """
         print("\n[Node: Service_complaint]")
-        print("Simulated: Logging your complaint about the delivery service.")
-        state["notes"] += "\n[Service_complaint] Complaint logged (simulated)."
-        return state
+        if self.complaint_sink is None:
+            print("Simulated: Logging your complaint about the delivery service.")
+            return {"tool_results": {"Service complaint Tool": "[Service_complaint] Complaint logged (simulated)."}}
+
+        order_id = self._order_id(state)
+        order = self.eta_store.get_order(order_id) if self.eta_store is not None else None
+
+        logged = self.complaint_sink.record(
+            state["user_message"],
+            session_id=state["session_id"],
+            order_id=order_id,
+            rider_id=order.rider_id if order is not None else None,
+        )
+        if logged:
+            print("Thank you, your complaint about the delivery service has been logged.")
+            result = "[Service_complaint] Complaint logged."
+        else:
+            print("We couldn't log your complaint right now, it has been noted in this conversation.")
+            result = "[Service_complaint] Complaint log unavailable, complaint not persisted."
+        return {"tool_results": {"Service complaint Tool": result}, "order_id": order_id}
         
     def bill_amount_verification(self, state: SomeState) -> dict:
         """
@@ -240,32 +430,38 @@ class NodeFunctions:
             Updated state with verified refund amount
         """
         print("\n[Node: Bill_Amount_verification]")
+
+        if self._vision_degraded():
+            self._defer_review(state, "Bill_Amount_verification")
+            state["refund_amount"] = 0
+            return state
         
         try:
-            prompt = f"<|image_1|>\n what is the price of the following item {state['refund_prdct']} reply with only the numeric value no currency"
+            prompt = bill_amount_prompt(state['refund_prdct'])
 
             url = state["image_bill_path"]
             image = Image.open(url)
             image.show()
             
-            inputs = self.ov_model.preprocess_inputs(
-                text=prompt, 
-                image=image, 
-                processor=self.processor
-            )
+            with self._admit("refund"):
+                inputs = self.ov_model.preprocess_inputs(
+                    text=prompt, 
+                    image=image, 
+                    processor=self.processor
+                )
 
-            generation_args = {
-                "max_new_tokens": 50,
-                "temperature": 0.0,
-                "do_sample": False,
-                "streamer": TextStreamer(self.processor.tokenizer, skip_prompt=True, skip_special_tokens=True)
-            }
-
-            generate_ids = self.ov_model.generate(
-                **inputs,
-                eos_token_id=self.processor.tokenizer.eos_token_id,
-                **generation_args
-            )
+                generation_args = {
+                    "max_new_tokens": 50,
+                    "temperature": 0.0,
+                    "do_sample": False,
+                    "streamer": TextStreamer(self.processor.tokenizer, skip_prompt=True, skip_special_tokens=True)
+                }
+
+                generate_ids = self.ov_model.generate(
+                    **inputs,
+                    eos_token_id=self.processor.tokenizer.eos_token_id,
+                    **generation_args
+                )
 
             generate_ids = generate_ids[:, inputs['input_ids'].shape[1]:]
             response = self.processor.batch_decode(
@@ -280,10 +476,15 @@ class NodeFunctions:
             except ValueError:
                 print("Could not parse amount as integer, defaulting to 0")
                 state["refund_amount"] = 0
+                state["review_reason"] = "Bill amount could not be read automatically"
                 
+        except AdmissionRejected:
+            self._defer_review(state, "Bill_Amount_verification")
+            state["refund_amount"] = 0
         except Exception as e:
             print(f"Error in bill verification: {e}")
             state["refund_amount"] = 0
+            state["review_reason"] = "Bill amount could not be read automatically"
             
         return state
 
@@ -298,6 +499,41 @@ class NodeFunctions:
             Updated state with refund information
         """
         print("\n[Node: Refund_Tool]")
-        print(f"Amount refunded: {state['refund_amount']}")
-        state["notes"] += f"\n[Refund_Tool] Processed refund of {state['refund_amount']} for {state['refund_prdct']}"
+        if self.refund_ledger is None:
+            print(f"Amount refunded: {state['refund_amount']}")
+            state["notes"] += f"\n[Refund_Tool] Processed refund of {state['refund_amount']} for {state['refund_prdct']}"
+            return state
+
+        if not state["refund_amount"]:
+            print("No verified amount to refund.")
+            state["notes"] += f"\n[Refund_Tool] No refund processed for {state['refund_prdct']} (no verified amount)."
+            return state
+
+        try:
+            result = self.refund_ledger.refund(
+                session_id=state["session_id"],
+                order_id=state.get("order_id", ""),
+                product=state["refund_prdct"],
+                amount=state["refund_amount"],
+                image_hash=hash_image(state["image_problem_path"]),
+            )
+        except IOError as e:
+            # The refund was not recorded, so it must not be paid; hand it to a human instead
+            print(f"Error recording refund: {e}")
+            reason = "Refund could not be recorded in the ledger"
+            state["notes"] += f"\n[Refund_Tool] {reason} for {state['refund_prdct']}: {e}. Escalated to a human agent."
+            if self.escalation_queue is not None:
+                case = self.escalation_queue.enqueue(state, reason, PRIORITY_REFUND)
+                print(f"A support agent will complete your refund, your case id is {case.case_id}.")
+            else:
+                print("Simulated: Escalating the refund to a human support agent.")
+            state["refund_amount"] = 0
+            return state
+        if result.refunded:
+            print(f"Amount refunded: {state['refund_amount']}")
+            state["notes"] += f"\n[Refund_Tool] Processed refund of {state['refund_amount']} for {state['refund_prdct']} (refund id {result.entry.refund_id})"
+        else:
+            print(f"This claim was already refunded (refund id {result.entry.refund_id}).")
+            state["notes"] += f"\n[Refund_Tool] Duplicate claim for {state['refund_prdct']}, already refunded as {result.entry.refund_id}"
+            state["refund_amount"] = 0
         return state
\ No newline at end of file
@@ -0,0 +1,282 @@
+# refund_ledger.py
+"""Idempotent refund ledger with a write-ahead log and in-memory indexes."""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+
+def hash_image(path: str) -> str:
+    """Return the SHA-256 of an image file, or "" if it cannot be read."""
+    if not path:
+        return ""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    except OSError:
+        return ""
+    return digest.hexdigest()
+
+
+@dataclass
+class RefundEntry:
+    """A single refund recorded in the ledger."""
+    refund_id: str
+    created_at: float
+    day: str
+    session_id: str
+    order_id: str
+    product: str
+    amount: int
+    image_hash: str
+
+
+@dataclass
+class RefundResult:
+    """Outcome of a refund request."""
+    refunded: bool
+    entry: RefundEntry
+    reason: str = ""
+
+
+class RefundLedger:
+    """
+    Refund ledger that never pays the same claim twice.
+
+    Every refund is appended to a JSON-lines write-ahead log before it is
+    confirmed. Duplicate detection is O(1) against two in-memory indexes:
+    the claim key (order id, or session id if there is none, plus product)
+    and the hash of the proof image. Concurrent callers are group-committed:
+    one writer thread appends and fsyncs everything pending in a single
+    write, then wakes all callers whose entries it covered. Daily refund
+    totals are maintained incrementally and rebuilt together with the
+    indexes by replaying the log on startup.
+    """
+
+    def __init__(self, path: str, fsync: bool = True, max_batch_delay: float = 0.002):
+        """
+        Open (or create) the ledger and replay its log.
+
+        Args:
+            path: Write-ahead log file
+            fsync: Whether each group commit is fsynced before callers return
+            max_batch_delay: Seconds the writer waits to gather a larger batch
+        """
+        self.path = path
+        self.fsync = fsync
+        self.max_batch_delay = max_batch_delay
+
+        self._lock = threading.Lock()
+        self._committed_cond = threading.Condition(self._lock)
+        self._pending_cond = threading.Condition(self._lock)
+        self._pending: List[RefundEntry] = []
+        self._uncommitted: Dict[str, int] = {}  # refund_id -> seq, indexed but not yet durable
+        self._next_seq = 0
+        self._committed_seq = 0
+        self._write_error: Optional[BaseException] = None
+        self._closed = False
+
+        self._by_claim: Dict[Tuple[str, str], RefundEntry] = {}
+        self._by_image: Dict[str, RefundEntry] = {}
+        self._daily: Dict[str, List[int]] = defaultdict(lambda: [0, 0])  # day -> [total, count]
+        self.stats = {"batches": 0, "entries": 0, "duplicates": 0}
+
+        self.replayed = self._replay()
+        self._log = open(self.path, "a", encoding="utf-8")
+        self._writer = threading.Thread(target=self._run, name="refund-ledger-writer", daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def _claim_key(session_id: str, order_id: str, product: str) -> Tuple[str, str]:
+        return (order_id or f"session:{session_id}", product.strip().lower())
+
+    def _index(self, entry: RefundEntry) -> None:
+        self._by_claim[self._claim_key(entry.session_id, entry.order_id, entry.product)] = entry
+        if entry.image_hash:
+            self._by_image[entry.image_hash] = entry
+        totals = self._daily[entry.day]
+        totals[0] += entry.amount
+        totals[1] += 1
+
+    def _unindex(self, entry: RefundEntry) -> None:
+        self._by_claim.pop(self._claim_key(entry.session_id, entry.order_id, entry.product), None)
+        if entry.image_hash and self._by_image.get(entry.image_hash) is entry:
+            del self._by_image[entry.image_hash]
+        totals = self._daily[entry.day]
+        totals[0] -= entry.amount
+        totals[1] -= 1
+
+    def _replay(self) -> int:
+        """
+        Rebuild indexes and daily totals from the log; return entries read.
+
+        A crash mid-write can leave a torn final record that was never
+        confirmed. The log is truncated back to the end of the last complete
+        record so the next append starts on a fresh line instead of being
+        glued onto the torn one (and lost on the following replay).
+        """
+        if not os.path.exists(self.path):
+            return 0
+        count = 0
+        offset = good_end = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = RefundEntry(**json.loads(line))
+                except (ValueError, TypeError):
+                    continue
+                self._index(entry)
+                count += 1
+                good_end = offset
+        if good_end < os.path.getsize(self.path):
+            os.truncate(self.path, good_end)
+        return count
+
+    def find_duplicate(self, session_id: str, order_id: str, product: str, image_hash: str = "") -> Optional[RefundEntry]:
+        """Return the existing refund matching this claim, if any."""
+        with self._lock:
+            return self._find_duplicate(self._claim_key(session_id, order_id, product), image_hash)
+
+    def _find_duplicate(self, claim_key: Tuple[str, str], image_hash: str) -> Optional[RefundEntry]:
+        existing = self._by_claim.get(claim_key)
+        if existing is None and image_hash:
+            existing = self._by_image.get(image_hash)
+        return existing
+
+    def refund(
+        self,
+        session_id: str,
+        order_id: str,
+        product: str,
+        amount: int,
+        image_hash: str = "",
+    ) -> RefundResult:
+        """
+        Record a refund unless the same claim was already refunded.
+
+        Blocks until the entry is durable in the log. A duplicate of a refund
+        still being written waits for that write, so a claim is never reported
+        as already refunded before the original is actually recorded.
+
+        Args:
+            session_id: Support conversation id
+            order_id: Order id, if known
+            product: Refunded product name
+            amount: Refund amount
+            image_hash: Hash of the proof image (see ``hash_image``)
+
+        Returns:
+            RefundResult with ``refunded`` False and the original entry for duplicates
+
+        Raises:
+            IOError: If the log write (or that of the original claim) failed
+        """
+        claim_key = self._claim_key(session_id, order_id, product)
+        now = time.time()
+        with self._lock:
+            if self._closed or self._write_error is not None:
+                raise IOError("Refund ledger is not accepting writes")
+            existing = self._find_duplicate(claim_key, image_hash)
+            if existing is not None:
+                original_seq = self._uncommitted.get(existing.refund_id)
+                if original_seq is not None:
+                    self._committed_cond.wait_for(
+                        lambda: self._committed_seq >= original_seq or self._write_error is not None
+                    )
+                    if self._committed_seq < original_seq:
+                        raise IOError(f"Refund ledger write failed: {self._write_error}")
+                self.stats["duplicates"] += 1
+                return RefundResult(False, existing, "duplicate claim")
+
+            entry = RefundEntry(
+                refund_id=uuid.uuid4().hex,
+                created_at=now,
+                day=datetime.fromtimestamp(now, tz=timezone.utc).strftime("%Y-%m-%d"),
+                session_id=session_id,
+                order_id=order_id,
+                product=product,
+                amount=amount,
+                image_hash=image_hash,
+            )
+            # Index before the write so concurrent retries see the claim immediately
+            self._index(entry)
+            self._pending.append(entry)
+            self._next_seq += 1
+            seq = self._next_seq
+            self._uncommitted[entry.refund_id] = seq
+            self._pending_cond.notify()
+
+            self._committed_cond.wait_for(lambda: self._committed_seq >= seq or self._write_error is not None)
+            if self._committed_seq < seq:
+                raise IOError(f"Refund ledger write failed: {self._write_error}")
+        return RefundResult(True, entry)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                self._pending_cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending and self._closed:
+                    return
+            if self.max_batch_delay:
+                time.sleep(self.max_batch_delay)
+            with self._lock:
+                batch, self._pending = self._pending, []
+                batch_end = self._committed_seq + len(batch)
+
+            try:
+                self._log.write("".join(json.dumps(asdict(entry), separators=(",", ":")) + "\n" for entry in batch))
+                self._log.flush()
+                if self.fsync:
+                    os.fsync(self._log.fileno())
+            except OSError as e:
+                with self._lock:
+                    # Unconfirmed refunds must not block a later retry of the same claim
+                    for entry in batch + self._pending:
+                        self._unindex(entry)
+                    self._pending = []
+                    self._uncommitted.clear()
+                    self._write_error = e
+                    self._committed_cond.notify_all()
+                return
+
+            with self._lock:
+                self._committed_seq = batch_end
+                for entry in batch:
+                    del self._uncommitted[entry.refund_id]
+                self.stats["batches"] += 1
+                self.stats["entries"] += len(batch)
+                self._committed_cond.notify_all()
+
+    def daily_total(self, day: str) -> Tuple[int, int]:
+        """Return (total amount, refund count) for a UTC "YYYY-MM-DD" day."""
+        with self._lock:
+            total, count = self._daily.get(day, (0, 0))
+            return total, count
+
+    def daily_totals(self) -> Dict[str, Tuple[int, int]]:
+        """Return (total amount, refund count) for every day in the ledger."""
+        with self._lock:
+            return {day: (total, count) for day, (total, count) in self._daily.items()}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._by_claim)
+
+    def close(self) -> None:
+        """Commit pending refunds and close the log."""
+        with self._lock:
+            self._closed = True
+            self._pending_cond.notify()
+        self._writer.join()
+        self._log.close()
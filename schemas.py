@@ -1,12 +1,32 @@
 # schemas.py
 """Type definitions and data schemas used throughout the application."""
-from typing import TypedDict, Optional
+import uuid
+from typing import Annotated, Dict, TypedDict, Optional
+
+def merge_tool_results(left: Dict[str, Optional[str]], right: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+    """
+    Reducer combining results of tools that ran in the same step.
+    
+    A ``None`` value removes that tool's result, which is how the agent marks results as consumed.
+    """
+    merged = dict(left or {})
+    for name, result in (right or {}).items():
+        if result is None:
+            merged.pop(name, None)
+        else:
+            merged[name] = result
+    return merged
+
+def keep_latest(left: Optional[str], right: Optional[str]) -> Optional[str]:
+    """Reducer keeping the newest non-empty value, so parallel tools may both report it."""
+    return right or left
 
 class SomeState(TypedDict):
     """
     State object storing workflow data across nodes.
     
     Attributes:
+        session_id: Unique identifier of this support conversation
         user_message: The user's current message
         user_first_message: The initial complaint or question
         verified: Whether the issue has been verified
@@ -17,7 +37,11 @@ class SomeState(TypedDict):
         refund_prdct: Product name for refund
         image_problem_path: Path to the problem image
         image_bill_path: Path to the bill image
+        order_id: Identifier of the order the user is asking about
+        review_reason: Why a refund claim needs a human to finish it, if it does
+        tool_results: Results of the tools run for the current message, keyed by tool node
     """
+    session_id: str
     user_message: str
     user_first_message: str
     verified: bool
@@ -28,10 +52,14 @@ class SomeState(TypedDict):
     refund_prdct: Optional[str]
     image_problem_path: Optional[str]
     image_bill_path: Optional[str]
+    order_id: Annotated[Optional[str], keep_latest]
+    review_reason: str
+    tool_results: Annotated[Dict[str, Optional[str]], merge_tool_results]
 
 def create_initial_state(user_message: str) -> SomeState:
     """Create and return a new state object with default values."""
     return {
+        "session_id": uuid.uuid4().hex,
         "user_message": user_message,
         "user_first_message": user_message,
         "verified": False,
@@ -41,5 +69,8 @@ def create_initial_state(user_message: str) -> SomeState:
         "refund_amount": 0,
         "refund_prdct": "",
         "image_problem_path": "",
-        "image_bill_path": ""
+        "image_bill_path": "",
+        "order_id": "",
+        "review_reason": "",
+        "tool_results": {}
     }
\ No newline at end of file
@@ -0,0 +1,141 @@
+# tests/test_admission.py
+"""Reservations, priority and shedding in admission control, and the paths taken under load."""
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from admission import AdmissionController, AdmissionRejected
+from conditionals import ConditionalRouters
+from escalation import EscalationQueue, PRIORITY_REFUND
+from nodes import NodeFunctions
+from schemas import create_initial_state
+
+
+def wait_until(predicate, timeout: float = 5.0) -> bool:
+    """Poll ``predicate`` until it holds or ``timeout`` seconds pass."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    """One reserved slot per route and one shared slot."""
+
+    def setUp(self):
+        self.admission = AdmissionController(
+            max_concurrent=3,
+            priorities={"refund": 0, "conversation": 1},
+            queue_limits={"refund": 2, "conversation": 2},
+            reserved={"refund": 1, "conversation": 1},
+            queue_timeout=5.0,
+        )
+
+    def acquire_in_thread(self, route: str, granted: list) -> threading.Thread:
+        thread = threading.Thread(target=lambda: (self.admission.acquire(route), granted.append(route)))
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        return thread
+
+    def test_reserved_slot_is_always_available(self):
+        self.admission.acquire("conversation")
+        self.admission.acquire("conversation")  # Takes the shared slot
+        with self.assertRaises(AdmissionRejected):
+            self.admission.acquire("conversation", timeout=0.01)
+        self.admission.acquire("refund", timeout=0)
+        self.assertEqual(self.admission.stats["refund"]["admitted"], 1)
+
+    def test_freed_shared_slot_goes_to_higher_priority_waiter(self):
+        for route in ("conversation", "conversation", "refund"):
+            self.admission.acquire(route)
+        granted = []
+        conversation = self.acquire_in_thread("conversation", granted)
+        self.assertTrue(wait_until(lambda: self.admission._queued["conversation"] == 1))
+        refund = self.acquire_in_thread("refund", granted)
+        self.assertTrue(wait_until(lambda: self.admission._queued["refund"] == 1))
+
+        self.admission.release("conversation")
+        refund.join(5)
+        self.assertEqual(granted, ["refund"])
+        self.assertTrue(conversation.is_alive())
+
+        self.admission.release("refund")
+        conversation.join(5)
+        self.assertEqual(granted, ["refund", "conversation"])
+
+    def test_full_queue_sheds(self):
+        admission = AdmissionController(1, {"refund": 0}, {"refund": 0})
+        admission.acquire("refund")
+        with self.assertRaises(AdmissionRejected) as raised:
+            admission.acquire("refund")
+        self.assertEqual(raised.exception.reason, "queue full")
+        self.assertEqual(admission.stats["refund"]["shed"], 1)
+
+    def test_timed_out_waiter_is_removed(self):
+        self.admission.acquire("refund")
+        self.admission.acquire("refund")  # Takes the shared slot
+        with self.assertRaises(AdmissionRejected) as raised:
+            self.admission.acquire("refund", timeout=0.01)
+        self.assertEqual(raised.exception.reason, "timed out in queue")
+        self.assertEqual(self.admission._waiting, [])
+        self.assertEqual(self.admission._queued["refund"], 0)
+
+        # The abandoned waiter must not be granted the next free slot
+        self.admission.release("refund")
+        self.admission.acquire("refund", timeout=0)
+        self.assertEqual(self.admission.stats["refund"]["timed_out"], 1)
+
+    def test_degraded_is_per_route(self):
+        self.admission.acquire("conversation")
+        self.admission.acquire("conversation")
+        self.assertTrue(self.admission.degraded("conversation"))
+        self.assertFalse(self.admission.degraded("refund"))
+
+
+class DegradedPathsTest(unittest.TestCase):
+    """Under load nodes and routers skip the models instead of queueing on them."""
+
+    def setUp(self):
+        self.admission = AdmissionController(1, {"refund": 0, "conversation": 1}, {"refund": 1, "conversation": 1})
+        self.admission.acquire("conversation")  # Saturates every route
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.queue = EscalationQueue(os.path.join(self.tmp.name, "escalations.db"), thumbnail_dir=self.tmp.name)
+        self.addCleanup(self.queue.close)
+        # No models: any model call would fail the test
+        self.nodes = NodeFunctions({}, admission=self.admission, escalation_queue=self.queue)
+        self.routers = ConditionalRouters({}, admission=self.admission)
+
+    def test_classifier_falls_back_to_keywords(self):
+        state = self.nodes.classifier(create_initial_state("My pizza arrived cold"))
+        self.assertEqual(state["classification"], "refundable")
+        state = self.nodes.classifier(create_initial_state("How do I change my address?"))
+        self.assertEqual(state["classification"], "non_refundable")
+
+    def test_user_convo_falls_back_to_keywords(self):
+        state = create_initial_state("Where is my order? The driver was rude")
+        self.assertEqual(self.routers.user_convo(state), ["ETA tool", "Service complaint Tool"])
+
+    def test_deferred_vision_check_is_escalated_to_a_human(self):
+        state = create_initial_state("My pizza arrived cold")
+        state["classification"] = "refundable"
+        answers = ["ord-1", "pizza", "proof.jpg", "bill.jpg"]
+        with mock.patch("builtins.input", side_effect=answers):
+            state = self.nodes.problem_verify(state)
+        self.assertFalse(state["verified"])
+        self.assertIn("deferred", state["review_reason"])
+        self.assertEqual(self.routers.verified_or_not(state), "Human in loop")
+
+        self.nodes.human_in_the_loop(state)
+        [case] = self.queue.open_cases()
+        self.assertEqual(case["priority"], PRIORITY_REFUND)
+        self.assertEqual(case["reason"], state["review_reason"])
+
+
+if __name__ == "__main__":
+    unittest.main()
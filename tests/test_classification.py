@@ -0,0 +1,33 @@
+# tests/test_classification.py
+"""Parsing of the classifier LLM's answer."""
+import unittest
+
+from nodes import parse_classification
+
+
+class ParseClassificationTest(unittest.TestCase):
+    """Only a plain "refundable" answer is refundable."""
+
+    CASES = [
+        ("refundable", "refundable"),
+        ("Refundable.", "refundable"),
+        ("**refundable**", "refundable"),
+        ("The complaint is refundable", "refundable"),
+        ("non_refundable", "non_refundable"),
+        ("`non_refundable`", "non_refundable"),
+        ("Non-refundable", "non_refundable"),
+        ("non refundable", "non_refundable"),
+        ("NOT refundable", "non_refundable"),
+        ("nonrefundable", "non_refundable"),
+        ("I am not sure", "non_refundable"),
+        ("", "non_refundable"),
+    ]
+
+    def test_answers(self):
+        for answer, expected in self.CASES:
+            with self.subTest(answer=answer):
+                self.assertEqual(parse_classification(answer), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
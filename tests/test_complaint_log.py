@@ -0,0 +1,70 @@
+# tests/test_complaint_log.py
+"""Failure handling of the complaint sink's background writer."""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from complaint_log import ComplaintSink
+
+
+class ComplaintSinkWriterTest(unittest.TestCase):
+    """The writer survives commit errors and reports when it is gone."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.sink = ComplaintSink(
+            os.path.join(self.tmp.name, "complaints.db"),
+            batch_size=1,
+            flush_interval=0.01,
+            retry_interval=0.01,
+        )
+        self.addCleanup(self.sink.close)
+
+    def test_failed_batch_is_retried(self):
+        connect = self.sink._connect
+        failures = [sqlite3.OperationalError("database is locked")] * 2
+
+        def flaky_connect():
+            if failures:
+                raise failures.pop()
+            return connect()
+
+        self.sink._connect = flaky_connect
+        self.assertTrue(self.sink.record("The driver was rude", rider_id="RIDER-0001"))
+        self.assertTrue(self.sink.flush(timeout=5))
+        self.assertEqual(self.sink.count(), 1)
+        self.assertEqual(self.sink.stats["write_errors"], 2)
+
+    def test_record_and_flush_fail_fast_once_writer_stopped(self):
+        self.sink.close()
+        self.assertFalse(self.sink.record("The driver was rude"))
+        self.assertTrue(self.sink.flush(timeout=5))
+
+    def test_record_racing_writer_shutdown_is_not_left_buffered(self):
+        put = self.sink._buffer.put
+
+        def put_after_close(item, timeout=None):
+            self.sink.close()  # The writer exits after record's first check
+            put(item, timeout=timeout)
+
+        self.sink._buffer.put = put_after_close
+        self.assertFalse(self.sink.record("The driver was rude"))
+        self.assertTrue(self.sink._buffer.empty())
+        self.assertEqual(self.sink.stats["dropped"], 1)
+        self.assertTrue(self.sink.flush(timeout=5))
+
+    def test_close_gives_up_on_a_broken_store(self):
+        def broken_connect():
+            raise sqlite3.OperationalError("disk I/O error")
+
+        self.sink._connect = broken_connect
+        self.assertTrue(self.sink.record("The driver was rude"))
+        self.sink.close()
+        self.assertFalse(self.sink.flush(timeout=5))
+        self.assertEqual(self.sink.stats["dropped"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
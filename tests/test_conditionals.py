@@ -0,0 +1,58 @@
+# tests/test_conditionals.py
+"""Parsing of the router LLM's answer and the keyword router used under load."""
+import unittest
+
+from conditionals import heuristic_route, parse_route_decision
+
+BOTH_TOOLS = ["ETA tool", "Service complaint Tool"]
+
+
+class ParseRouteDecisionTest(unittest.TestCase):
+    """Only exact route options select a node, however the answer is formatted."""
+
+    CASES = [
+        ("ETA tool", ["ETA tool"]),
+        ('"ETA tool"', ["ETA tool"]),
+        ("**Service complaint**", ["Service complaint Tool"]),
+        ("ETA tool, Service complaint", BOTH_TOOLS),
+        ("ETA tool\nService complaint", BOTH_TOOLS),
+        ("1. ETA tool\n2. Service complaint", BOTH_TOOLS),
+        ("1) ETA tool\n2) Service complaint", BOTH_TOOLS),
+        ("- ETA tool\n- Service complaint", BOTH_TOOLS),
+        ("* ETA tool", ["ETA tool"]),
+        ("ETA tool, ETA tool", ["ETA tool"]),
+        ("check", "check"),
+        ("1. check", "check"),
+        ("check, ETA tool", ["ETA tool"]),
+        ("Agent", "Agent"),
+        ("The user does not need the ETA tool", "Agent"),
+        ("", "Agent"),
+    ]
+
+    def test_answers(self):
+        for answer, expected in self.CASES:
+            with self.subTest(answer=answer):
+                self.assertEqual(parse_route_decision(answer), expected)
+
+
+class HeuristicRouteTest(unittest.TestCase):
+    """Keyword routing matches whole words only."""
+
+    CASES = [
+        ("When will my order arrive?", ["ETA tool"]),
+        ("The driver was rude to me", ["Service complaint Tool"]),
+        ("Where is my order? The delivery person was impolite", BOTH_TOOLS),
+        ("Thanks, that's all", "check"),
+        ("Thanks, but how long until it arrives?", ["ETA tool"]),
+        ("I'd like to update my address", "Agent"),
+        ("The theta of my meal is off", "Agent"),  # "eta" inside a word
+    ]
+
+    def test_messages(self):
+        for message, expected in self.CASES:
+            with self.subTest(message=message):
+                self.assertEqual(heuristic_route(message), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
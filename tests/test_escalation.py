@@ -0,0 +1,94 @@
+# tests/test_escalation.py
+"""Persistence and cross-process leasing of the escalation queue."""
+import os
+import tempfile
+import time
+import unittest
+
+from escalation import EscalationQueue, PRIORITY_REFUND, PRIORITY_UNRESOLVED, shard_path
+from schemas import create_initial_state
+
+
+class EscalationQueuePersistenceTest(unittest.TestCase):
+    """Cases outlive the process that escalated them."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "escalations.db")
+
+    def open_queue(self, lease_seconds: float = 300.0) -> EscalationQueue:
+        queue = EscalationQueue(self.path, num_shards=2, lease_seconds=lease_seconds, thumbnail_dir=self.tmp.name)
+        self.addCleanup(queue.close)
+        return queue
+
+    def escalate(self, queue: EscalationQueue, message: str, priority: int):
+        state = create_initial_state(message)
+        state["notes"] = "\n[Agent conversation] User: hi\nAgent: hello"
+        return queue.enqueue(state, "test", priority)
+
+    def test_cases_survive_restart_in_priority_order(self):
+        queue = self.open_queue()
+        unresolved = self.escalate(queue, "still waiting", PRIORITY_UNRESOLVED)
+        refund = self.escalate(queue, "torn packet", PRIORITY_REFUND)
+        queue.close()
+
+        queue = self.open_queue()
+        self.assertEqual(queue.depth(), 2)
+        first = queue.lease("agent-1")
+        self.assertEqual(first.case_id, refund.case_id)
+        self.assertIn("torn packet", first.bundle(timeout=5).transcript_summary)
+        self.assertTrue(queue.ack(first.case_id, first.lease_token))
+        self.assertEqual(queue.lease("agent-1").case_id, unresolved.case_id)
+
+    def test_shards_are_stored_separately_and_leased_by_priority(self):
+        queue = self.open_queue()
+        sessions = {}
+        for n in range(20):
+            state = create_initial_state(f"complaint {n}")
+            sessions.setdefault(queue.shard_for(state["session_id"]), []).append(state)
+        self.assertEqual(set(sessions), {0, 1})
+        unresolved = queue.enqueue(sessions[0][0], "test", PRIORITY_UNRESOLVED)
+        refund = queue.enqueue(sessions[1][0], "test", PRIORITY_REFUND)
+        self.assertTrue(os.path.exists(shard_path(self.path, 0)))
+        self.assertTrue(os.path.exists(shard_path(self.path, 1)))
+
+        # An agent preferring shard 0 still gets the more urgent case from shard 1 first
+        self.assertEqual(queue.lease("agent-1", shard=0).case_id, refund.case_id)
+        self.assertEqual(queue.lease("agent-1", shard=0).case_id, unresolved.case_id)
+
+    def test_lease_is_exclusive_across_processes_and_ack_from_another(self):
+        producer = self.open_queue()
+        case = self.escalate(producer, "torn packet", PRIORITY_REFUND)
+
+        console_a, console_b = self.open_queue(), self.open_queue()
+        leased = console_a.lease("agent-a")
+        self.assertEqual(leased.case_id, case.case_id)
+        self.assertIsNone(console_b.lease("agent-b"))
+
+        # A later console process acknowledges with the printed token
+        self.assertTrue(self.open_queue().ack(case.case_id, leased.lease_token))
+        self.assertEqual(producer.open_cases(), [])
+
+    def test_expired_lease_from_another_process_is_requeued(self):
+        producer = self.open_queue(lease_seconds=0.05)
+        case = self.escalate(producer, "torn packet", PRIORITY_REFUND)
+        self.assertIsNotNone(self.open_queue(lease_seconds=0.05).lease("agent-a"))
+
+        other = self.open_queue(lease_seconds=0.05)
+        self.assertIsNone(other.lease("agent-b"))
+        time.sleep(0.1)
+        self.assertEqual(other.lease("agent-b").case_id, case.case_id)
+
+    def test_first_action_latencies_are_bounded(self):
+        queue = EscalationQueue(self.path, thumbnail_dir=self.tmp.name, latency_window=3)
+        self.addCleanup(queue.close)
+        for n in range(5):
+            self.escalate(queue, f"case {n}", PRIORITY_UNRESOLVED)
+        while queue.lease("agent-1") is not None:
+            pass
+        self.assertEqual(len(queue.first_action_latencies), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
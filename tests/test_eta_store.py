@@ -0,0 +1,92 @@
+# tests/test_eta_store.py
+"""ETA estimates, the grid index and the rider simulator."""
+import unittest
+
+from eta_store import OrderRiderStore, RiderSimulator, haversine_km
+
+PICKUP = (12.9716, 77.5946)
+DROPOFF = (12.9900, 77.6100)
+
+
+class OrderRiderStoreTest(unittest.TestCase):
+    """ETAs follow the order through pickup and delivery."""
+
+    def setUp(self):
+        self.store = OrderRiderStore(cell_size_deg=0.01, default_speed_kmh=20.0, road_factor=1.0)
+        self.store.add_order("ORD-1", "RIDER-1", PICKUP, DROPOFF)
+        self.rider = (12.9600, 77.5900)
+        self.store.update_locations([("RIDER-1", *self.rider, 100.0)])
+
+    def expected_minutes(self, distance_km: float) -> float:
+        return distance_km / 20.0 * 60
+
+    def test_unknown_order_or_rider_has_no_eta(self):
+        self.assertIsNone(self.store.eta_minutes("ORD-404"))
+        self.store.add_order("ORD-2", "RIDER-404", PICKUP, DROPOFF)
+        self.assertIsNone(self.store.eta_minutes("ORD-2"))
+
+    def test_eta_through_pickup_and_delivery(self):
+        to_pickup = haversine_km(*self.rider, *PICKUP) + haversine_km(*PICKUP, *DROPOFF)
+        self.assertAlmostEqual(self.store.eta_minutes("ORD-1"), self.expected_minutes(to_pickup))
+
+        self.store.mark_picked_up("ORD-1")
+        to_dropoff = haversine_km(*self.rider, *DROPOFF)
+        self.assertAlmostEqual(self.store.eta_minutes("ORD-1"), self.expected_minutes(to_dropoff))
+
+        self.store.mark_delivered("ORD-1")
+        self.assertEqual(self.store.eta_minutes("ORD-1"), 0.0)
+        self.assertTrue(self.store.get_order("ORD-1").delivered)
+
+    def test_stale_updates_are_skipped(self):
+        applied = self.store.update_locations([("RIDER-1", *PICKUP, 50.0), ("RIDER-2", *PICKUP, 50.0)])
+        self.assertEqual(applied, 1)
+        self.assertEqual((self.store.rider_position("RIDER-1").lat, self.store.rider_position("RIDER-1").lon), self.rider)
+
+
+class RidersNearTest(unittest.TestCase):
+    """Grid queries return exactly the riders within the radius, nearest first."""
+
+    def setUp(self):
+        self.store = OrderRiderStore(cell_size_deg=0.01)
+        self.center = PICKUP
+        self.store.update_locations([
+            ("near", self.center[0] + 0.001, self.center[1], 0.0),
+            ("next-cell", self.center[0] + 0.012, self.center[1], 0.0),
+            ("far", self.center[0] + 0.2, self.center[1], 0.0),
+        ])
+
+    def test_radius_and_order(self):
+        found = self.store.riders_near(*self.center, radius_km=2.0)
+        self.assertEqual([rider_id for rider_id, _ in found], ["near", "next-cell"])
+        self.assertLess(found[0][1], found[1][1])
+        self.assertEqual([rider_id for rider_id, _ in self.store.riders_near(*self.center, radius_km=0.5)], ["near"])
+
+    def test_rider_moving_cells_is_reindexed(self):
+        self.store.update_locations([("far", self.center[0] - 0.003, self.center[1], 60.0)])
+        self.assertIn("far", [rider_id for rider_id, _ in self.store.riders_near(*self.center, radius_km=1.0)])
+        old = (self.center[0] + 0.2, self.center[1])
+        self.assertEqual(self.store.riders_near(*old, radius_km=1.0), [])
+
+
+class RiderSimulatorTest(unittest.TestCase):
+    """Simulated riders collect and then deliver their orders."""
+
+    def test_orders_are_picked_up_then_delivered(self):
+        store = OrderRiderStore()
+        simulator = RiderSimulator(store, num_riders=5, seed=1)
+        self.assertEqual(len(store), 5)
+        self.assertFalse(any(store.get_order(f"ORD-{n:04d}").picked_up for n in range(5)))
+
+        # A one-day step is long enough to reach any target in the simulated area
+        now = 1e9
+        simulator.step(86400, now=now)
+        orders = [store.get_order(f"ORD-{n:04d}") for n in range(5)]
+        self.assertTrue(all(order.picked_up and not order.delivered for order in orders))
+
+        simulator.step(86400, now=now + 1)
+        self.assertTrue(all(order.delivered for order in orders))
+        self.assertTrue(all(store.eta_minutes(f"ORD-{n:04d}") == 0.0 for n in range(5)))
+
+
+if __name__ == "__main__":
+    unittest.main()
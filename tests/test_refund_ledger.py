@@ -0,0 +1,119 @@
+# tests/test_refund_ledger.py
+"""Crash-recovery and concurrency tests for the refund ledger's write-ahead log."""
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from refund_ledger import RefundLedger
+
+
+class RefundLedgerRecoveryTest(unittest.TestCase):
+    """Replaying a log left behind by a crash."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "refund_ledger.log")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open_ledger(self) -> RefundLedger:
+        ledger = RefundLedger(self.path, fsync=False, max_batch_delay=0)
+        self.addCleanup(ledger.close)
+        return ledger
+
+    def test_replay_restores_refunds_and_rejects_duplicates(self):
+        ledger = self.open_ledger()
+        self.assertTrue(ledger.refund("s1", "ORD-1", "namkeen", 40).refunded)
+        ledger.close()
+
+        ledger = self.open_ledger()
+        self.assertEqual(ledger.replayed, 1)
+        self.assertFalse(ledger.refund("s2", "ORD-1", "Namkeen", 40).refunded)
+
+    def test_torn_tail_is_truncated_before_appending(self):
+        ledger = self.open_ledger()
+        ledger.refund("s1", "ORD-1", "namkeen", 40)
+        ledger.close()
+        with open(self.path, "rb") as f:
+            intact = f.read()
+        with open(self.path, "ab") as f:
+            f.write(b'{"refund_id":"torn","created_at":')  # Crash mid-write
+
+        ledger = self.open_ledger()
+        self.assertEqual(ledger.replayed, 1)
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), intact)
+
+        # A refund confirmed after recovery must survive the next restart
+        self.assertTrue(ledger.refund("s2", "ORD-2", "pizza", 250).refunded)
+        ledger.close()
+
+        ledger = self.open_ledger()
+        self.assertEqual(ledger.replayed, 2)
+        self.assertFalse(ledger.refund("s3", "ORD-2", "pizza", 250).refunded)
+
+
+class BrokenLog:
+    """Log file whose writes fail like a full disk."""
+
+    def write(self, data):
+        raise OSError("No space left on device")
+
+    def close(self):
+        pass
+
+
+class RefundLedgerPendingDuplicateTest(unittest.TestCase):
+    """A duplicate of a claim still being written waits for that write."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        # A long batch delay keeps the first refund uncommitted while the duplicate arrives
+        self.ledger = RefundLedger(os.path.join(self.tmp.name, "refund_ledger.log"), fsync=False, max_batch_delay=0.2)
+        self.addCleanup(self.ledger.close)
+
+    def refund_in_thread(self) -> list:
+        outcome = []
+
+        def refund():
+            try:
+                outcome.append(self.ledger.refund("s1", "ORD-1", "namkeen", 40))
+            except IOError as e:
+                outcome.append(e)
+
+        thread = threading.Thread(target=refund)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        deadline = time.monotonic() + 5
+        while self.ledger._next_seq < 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return outcome
+
+    def test_duplicate_returns_once_original_is_committed(self):
+        original = self.refund_in_thread()
+        result = self.ledger.refund("s2", "ORD-1", "namkeen", 40)
+        self.assertFalse(result.refunded)
+        self.assertGreaterEqual(self.ledger._committed_seq, 1)
+        self.assertEqual(result.entry.refund_id, self.wait_for(original).entry.refund_id)
+
+    def test_duplicate_fails_when_original_write_fails(self):
+        self.ledger._log = BrokenLog()
+        original = self.refund_in_thread()
+        with self.assertRaises(IOError):
+            self.ledger.refund("s2", "ORD-1", "namkeen", 40)
+        self.assertIsInstance(self.wait_for(original), IOError)
+        self.assertEqual(self.ledger.stats["duplicates"], 0)
+
+    def wait_for(self, outcome: list):
+        deadline = time.monotonic() + 5
+        while not outcome and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return outcome[0]
+
+
+if __name__ == "__main__":
+    unittest.main()